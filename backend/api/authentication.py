@@ -0,0 +1,68 @@
+import copy
+import time
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from api.metrics import registry
+from recipes.cache import (LRUCache, get_version, peek_version,
+                           token_scope)
+
+HIT, MISS, STALE, EXPIRED = 'hit', 'miss', 'stale', 'expired'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кешем токенов в памяти процесса.
+
+    Запись кеша хранит пользователя, токен и версию токена из общего
+    кеша. Версия увеличивается при удалении токена (выход), изменении
+    и удалении пользователя (смена пароля, деактивация), поэтому
+    отозванный токен перестает работать во всех процессах сразу, а
+    запрос к БД заменяется чтением версии из общего кеша. Изменения в
+    обход сигналов (например, QuerySet.update(is_active=False)) видны
+    не позже чем через TOKEN_CACHE_TTL секунд.
+    """
+
+    cache = LRUCache(settings.TOKEN_CACHE_SIZE)
+
+    def authenticate_credentials(self, key):
+        # Версия читается до запроса к БД: если токен отзовут во время
+        # запроса, запись кеша окажется устаревшей. Для неизвестных
+        # токенов версия в общем кеше не создается.
+        version = peek_version(token_scope(key))
+        entry = self.cache.get(key)
+        if entry is None:
+            result = MISS
+        else:
+            user, token, entry_version, expires = entry
+            if version is None or entry_version != version:
+                result = STALE
+            elif time.monotonic() >= expires:
+                result = EXPIRED
+            else:
+                self.record(HIT)
+                token = copy.copy(token)
+                token.user = copy.copy(user)
+                return token.user, token
+        self.record(result)
+        self.cache.delete(key)
+        user, token = super().authenticate_credentials(key)
+        if version is None:
+            # Версия создается только для действующего токена. Созданная
+            # после запроса к БД, она могла пропустить отзыв токена,
+            # поэтому запись кеша появится при следующем запросе.
+            get_version(token_scope(key))
+            return user, token
+        self.cache.set(key, (
+            user, token, version, time.monotonic() + settings.TOKEN_CACHE_TTL
+        ))
+        return user, token
+
+    @staticmethod
+    def record(result):
+        registry.increment(
+            'token_cache_lookups_total',
+            'Обращения к кешу токенов аутентификации',
+            result=result,
+        )
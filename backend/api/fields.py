@@ -1,16 +1,99 @@
 import base64
+import binascii
+import warnings
+from tempfile import SpooledTemporaryFile
 
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
 from rest_framework import serializers
 
+from recipes.constants import ImageConstants
+
 
 class Base64ImageField(serializers.ImageField):
-    """Кастомный сериализатор, преобразующий картинки."""
+    """
+    Кастомный сериализатор, преобразующий картинки.
+
+    Base64 декодируется частями во временный файл, который остается
+    в памяти только до ImageConstants.SPOOL_SIZE байт. Картинка
+    проверяется по заголовку без декодирования пикселей.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Некорректные данные base64.',
+        'max_bytes': 'Размер картинки не должен превышать {max_bytes} байт.',
+        'max_pixels': 'Картинка не должна быть больше {max_pixels} пикселей.',
+        'invalid_format': 'Допустимые форматы картинок: {formats}.',
+    }
 
     def to_internal_value(self, image_data):
         if isinstance(image_data, str) and image_data.startswith('data:image'):
-            format, imgstr = image_data.split(';base64,')
+            format, separator, imgstr = image_data.partition(';base64,')
+            if not separator:
+                self.fail('invalid_base64')
             ext = format.split('/')[-1]
-            image_data = ContentFile(
-                base64.b64decode(imgstr), name=f'temp.{ext}')
-        return super().to_internal_value(image_data)
+            image_data = self.decode(imgstr, f'temp.{ext}')
+        file_object = serializers.FileField.to_internal_value(
+            self, image_data
+        )
+        self.validate_image(file_object)
+        return file_object
+
+    def decode(self, encoded, name):
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        file = SpooledTemporaryFile(max_size=ImageConstants.SPOOL_SIZE)
+        size = 0
+        leftover = ''
+        try:
+            for start in range(
+                0, len(encoded), ImageConstants.DECODE_CHUNK_SIZE
+            ):
+                chunk = leftover + ''.join(
+                    encoded[start:start + ImageConstants.DECODE_CHUNK_SIZE]
+                    .split()
+                )
+                usable = len(chunk) - len(chunk) % 4
+                size += file.write(
+                    base64.b64decode(chunk[:usable], validate=True)
+                )
+                leftover = chunk[usable:]
+                if size > max_bytes:
+                    self.fail('max_bytes', max_bytes=max_bytes)
+            if leftover:
+                raise binascii.Error
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_base64')
+        except serializers.ValidationError:
+            file.close()
+            raise
+        file.seek(0)
+        image_file = File(file, name=name)
+        image_file.size = size
+        return image_file
+
+    def validate_image(self, file_object):
+        max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+        max_pixels = settings.IMAGE_UPLOAD_MAX_PIXELS
+        if file_object.size > max_bytes:
+            self.fail('max_bytes', max_bytes=max_bytes)
+        file_object.seek(0)
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                with Image.open(file_object) as image:
+                    image_format = image.format
+                    width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('max_pixels', max_pixels=max_pixels)
+        except (OSError, SyntaxError, ValueError):
+            self.fail('invalid_image')
+        finally:
+            file_object.seek(0)
+        if image_format not in ImageConstants.FORMATS:
+            self.fail(
+                'invalid_format', formats=', '.join(ImageConstants.FORMATS)
+            )
+        if width * height > max_pixels:
+            self.fail('max_pixels', max_pixels=max_pixels)
@@ -1,13 +1,9 @@
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
 from recipes.models import Recipe, Tag
+from recipes.search import search_recipes
 
-
-class IngredientSearchFilter(SearchFilter):
-    """Фильтр поиска для ингредиентов по названию."""
-
-    search_param = 'name'
+POPULAR_ORDERING = ('-favorites_count', '-pub_date', '-id')
 
 
 class RecipeFilter(FilterSet):
@@ -17,22 +13,38 @@ class RecipeFilter(FilterSet):
     Ключевые параметры:
     tags - позволяет фильтровать рецепты по слагам тегов
     is_favorited - нахождение рецепта в избранном
-    is_in_shopping_cart - в корзине покупок.
+    is_in_shopping_cart - в корзине покупок
+    search - полнотекстовый поиск с сортировкой по релевантности
+    ordering=popular - сортировка по количеству добавлений в избранное.
     """
 
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),),
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+            'search', 'ordering',
+        )
+
+    def filter_tags(self, queryset, name, tags):
+        if tags:
+            return queryset.with_any_tags(tags)
+        return queryset
 
     def filter_is_favorited(self, queryset, name, is_favorited_value):
         if is_favorited_value:
@@ -46,3 +58,13 @@ class RecipeFilter(FilterSet):
         if is_in_shopping_cart_value:
             return queryset.filter(shopping_cart__user=self.request.user.id)
         return queryset
+
+    def filter_search(self, queryset, name, search_value):
+        if search_value.strip():
+            return search_recipes(queryset, search_value)
+        return queryset
+
+    def filter_ordering(self, queryset, name, ordering_value):
+        if ordering_value == 'popular':
+            return queryset.order_by(*POPULAR_ORDERING)
+        return queryset
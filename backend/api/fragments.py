@@ -0,0 +1,92 @@
+"""
+Кеш фрагментов рецептов.
+
+Фрагмент - часть представления рецепта, одинаковая для всех
+пользователей. Ключ фрагмента включает версии рецепта, его автора и
+справочников тегов и ингредиентов, поэтому изменение любого из них
+делает старый фрагмент недоступным.
+"""
+import hashlib
+
+from django.core.cache import caches
+from django.db.models import CharField, Value
+
+from recipes.cache import get_versions, recipe_scope, user_scope
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+FRAGMENT_CACHE = 'fragments'
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+FAVORITE, SHOPPING_CART, SUBSCRIPTION = 'favorite', 'shopping_cart', 'sub'
+
+
+def get_fragments(recipes, base_url, build):
+    """
+    Возвращает фрагменты рецептов в порядке recipes.
+
+    Отсутствующие в кеше фрагменты строятся функцией build(recipes)
+    и сохраняются в кеш.
+    """
+    scopes = {'tags', 'ingredients'}
+    for recipe in recipes:
+        scopes.add(recipe_scope(recipe.id))
+        scopes.add(user_scope(recipe.author_id))
+    versions = get_versions(scopes)
+    keys = [
+        'recipe-fragment:{}:{}'.format(recipe.id, hashlib.md5(repr((
+            versions[recipe_scope(recipe.id)],
+            versions[user_scope(recipe.author_id)],
+            versions['tags'],
+            versions['ingredients'],
+            base_url,
+        )).encode()).hexdigest())
+        for recipe in recipes
+    ]
+    cache = caches[FRAGMENT_CACHE]
+    fragments = cache.get_many(keys)
+    missing = [
+        (key, recipe) for key, recipe in zip(keys, recipes)
+        if key not in fragments
+    ]
+    if missing:
+        built = dict(zip(
+            (key for key, _ in missing),
+            build([recipe for _, recipe in missing]),
+        ))
+        cache.set_many(built, FRAGMENT_TIMEOUT)
+        fragments.update(built)
+    return [fragments[key] for key in keys]
+
+
+def get_memberships(user, recipe_ids=(), author_ids=()):
+    """
+    Одним запросом находит избранное, корзину и подписки пользователя.
+
+    Возвращает словарь множеств id рецептов (избранное, корзина)
+    и id авторов (подписки).
+    """
+    memberships = {FAVORITE: set(), SHOPPING_CART: set(), SUBSCRIPTION: set()}
+    queries = []
+    if recipe_ids:
+        for kind, model in ((FAVORITE, Favorite),
+                            (SHOPPING_CART, ShoppingCart)):
+            queries.append(model.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).annotate(
+                kind=Value(kind, output_field=CharField())
+            ).values_list('recipe_id', 'kind').order_by())
+    if author_ids:
+        queries.append(Subscription.objects.filter(
+            user=user, following_id__in=author_ids
+        ).annotate(
+            kind=Value(SUBSCRIPTION, output_field=CharField())
+        ).values_list('following_id', 'kind').order_by())
+    if not queries:
+        return memberships
+    query, *other_queries = queries
+    if other_queries:
+        query = query.union(*other_queries, all=True)
+    for object_id, kind in query:
+        memberships[kind].add(object_id)
+    return memberships
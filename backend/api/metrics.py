@@ -0,0 +1,187 @@
+"""
+Метрики производительности запросов.
+
+Для каждого выбранного запроса замеряются число и время SQL-запросов,
+время работы представления без SQL (в DRF это в основном сериализация:
+сериализаторы ленивые, и запросы к БД выполняются прямо внутри нее)
+и время рендеринга ответа. Замеры агрегируются в гистограммы по
+маршруту и методу, события других модулей - в счетчики. Метрики
+хранятся в памяти процесса, поэтому каждый рабочий процесс сервера
+отдает свои.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from recipes.constants import MetricsConstants
+
+DB, SERIALIZE, RENDER, TOTAL = 'db', 'serialize', 'render', 'total'
+
+HISTOGRAMS = (
+    (TOTAL, 'request_duration_seconds', 'Время обработки запроса'),
+    (DB, 'db_duration_seconds', 'Время SQL-запросов'),
+    (SERIALIZE, 'serialize_duration_seconds',
+     'Время работы представления без SQL'),
+    (RENDER, 'render_duration_seconds', 'Время рендеринга ответа'),
+)
+QUERIES_HISTOGRAM = ('db_queries', 'Число SQL-запросов')
+
+
+class RequestTimings:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.view_started = self.view_db = None
+        self.view = None
+        self.render_started = None
+        self.render = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обертка execute_wrapper, считающая SQL-запросы."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def start_view(self):
+        self.view_started = time.perf_counter()
+        self.view_db = self.db
+
+    def finish_view(self):
+        if self.view_started is not None and self.view is None:
+            self.view = max(
+                time.perf_counter() - self.view_started
+                - (self.db - self.view_db),
+                0.0,
+            )
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        self.render = time.perf_counter() - self.render_started
+        return response
+
+    def finish(self):
+        """Возвращает словарь длительностей в секундах."""
+        self.finish_view()
+        return {
+            DB: self.db,
+            SERIALIZE: self.view or 0.0,
+            RENDER: self.render,
+            TOTAL: time.perf_counter() - self.started,
+        }
+
+    def server_timing(self, durations):
+        """Значение заголовка Server-Timing."""
+        return ', '.join(
+            f'{name};dur={durations[name] * 1000:.1f}'
+            + (f';desc="{self.queries} SQL"' if name == DB else '')
+            for name in (DB, SERIALIZE, RENDER, TOTAL)
+        )
+
+
+class Histogram:
+    """Накопительная гистограмма в формате Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        bounds = [*map(str, self.buckets), '+Inf']
+        for bound, count in zip(bounds, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+def escape_label(value):
+    return (value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+class MetricsRegistry:
+    """Гистограммы замеров по маршруту и методу и счетчики событий."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def increment(self, name, description, **labels):
+        """Увеличивает счетчик name с метками labels."""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            if name not in self.counters:
+                self.counters[name] = (description, Counter())
+            self.counters[name][1][key] += 1
+
+    def observe(self, route, method, durations, queries):
+        key = (route, method)
+        with self.lock:
+            histograms = self.histograms.get(key)
+            if histograms is None:
+                histograms = self.histograms[key] = {
+                    name: Histogram(MetricsConstants.DURATION_BUCKETS)
+                    for name, _, _ in HISTOGRAMS
+                }
+                histograms[QUERIES_HISTOGRAM[0]] = Histogram(
+                    MetricsConstants.QUERIES_BUCKETS
+                )
+            for name, value in durations.items():
+                histograms[name].observe(value)
+            histograms[QUERIES_HISTOGRAM[0]].observe(queries)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def prometheus(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for key, metric, description in (
+                *HISTOGRAMS, (QUERIES_HISTOGRAM[0], *QUERIES_HISTOGRAM)
+            ):
+                name = f'{MetricsConstants.PREFIX}_{metric}'
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (route, method), histograms in sorted(
+                    self.histograms.items()
+                ):
+                    lines.extend(histograms[key].lines(
+                        name,
+                        f'route="{escape_label(route)}",'
+                        f'method="{escape_label(method)}"',
+                    ))
+            for metric, (description, values) in sorted(
+                self.counters.items()
+            ):
+                name = f'{MetricsConstants.PREFIX}_{metric}'
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} counter')
+                for labels, value in sorted(values.items()):
+                    labels = ','.join(
+                        f'{label}="{escape_label(str(label_value))}"'
+                        for label, label_value in labels
+                    )
+                    lines.append(f'{name}{{{labels}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
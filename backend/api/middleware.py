@@ -0,0 +1,141 @@
+import hashlib
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import SAFE_METHODS
+
+from api.metrics import RequestTimings, registry
+from foodgram.routers import replica_configured, use_replica
+from profiler.middleware import staff_user
+from recipes.cache import token_scope
+
+
+class ServerTimingMiddleware:
+    """
+    Замеры времени обработки запросов.
+
+    Для доли запросов METRICS_SAMPLE_RATE учитывает замеры в
+    гистограммах api.metrics. Заголовок Server-Timing раскрывает
+    устройство обработки запроса, поэтому добавляется только для
+    сотрудников или при включенной настройке SERVER_TIMING_HEADER.
+    Остальные запросы проходят без дополнительной работы.
+
+    Тело потокового ответа формируется уже после отправки заголовков,
+    поэтому Server-Timing у таких ответов нет, а замеры, включая SQL
+    во время отдачи тела (как рендеринг), попадают в гистограммы по
+    окончании потока.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.METRICS_SAMPLE_RATE
+        if sample_rate <= 0 or (
+            sample_rate < 1 and random.random() >= sample_rate
+        ):
+            return self.get_response(request)
+        timings = request.timings = RequestTimings()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(timings.execute)
+                )
+            response = self.get_response(request)
+            if response.streaming:
+                timings.finish_view()
+                timings.start_render()
+                response.streaming_content = self.stream(
+                    response.streaming_content, request, timings,
+                    stack.pop_all(),
+                )
+                return response
+        durations = self.observe(request, timings)
+        if settings.SERVER_TIMING_HEADER or staff_user(request):
+            response['Server-Timing'] = timings.server_timing(durations)
+        return response
+
+    def stream(self, content, request, timings, stack):
+        """Отдает тело ответа, замеряя его формирование."""
+        try:
+            yield from content
+        finally:
+            stack.close()
+            timings.finish_render(None)
+            self.observe(request, timings)
+
+    @staticmethod
+    def observe(request, timings):
+        """Учитывает замеры запроса и возвращает длительности."""
+        durations = timings.finish()
+        match = request.resolver_match
+        registry.observe(
+            match.view_name if match else 'unmatched',
+            request.method,
+            durations,
+            timings.queries,
+        )
+        return durations
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            timings.start_view()
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is not None:
+            timings.finish_view()
+            timings.start_render()
+            response.add_post_render_callback(timings.finish_render)
+        return response
+
+
+def client_key(request):
+    """Клиент запроса: хеш токена или сессионной cookie."""
+    auth = get_authorization_header(request).split()
+    if len(auth) == 2 and auth[0].lower() == b'token':
+        return token_scope(auth[1].decode(errors='replace'))
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        return 'session:' + hashlib.sha256(session.encode()).hexdigest()
+    return None
+
+
+def sticky_key(client):
+    return f'replica-sticky:{client}'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Чтения безопасных запросов из реплики.
+
+    После успешного изменяющего запроса клиент на REPLICA_STICKY_SECONDS
+    секунд закрепляется за основной базой, чтобы сразу видеть свои
+    изменения (избранное, список покупок), даже если реплика отстает.
+    Отметка хранится в общем кеше и видна всем процессам. Без
+    настроенной реплики middleware ничего не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_configured():
+            return self.get_response(request)
+        client = client_key(request)
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            if client and response.status_code < 400:
+                cache.set(
+                    sticky_key(client), True,
+                    settings.REPLICA_STICKY_SECONDS,
+                )
+            return response
+        sticky = client is not None and cache.get(sticky_key(client))
+        with use_replica(not sticky):
+            return self.get_response(request)
@@ -0,0 +1,57 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.cache import LRUCache, get_version
+
+RESPONSE_CACHE_SIZE = 1024
+
+
+class CatalogCacheMixin:
+    """
+    Кеширование ответов справочников.
+
+    Ответ помечается ETag и Last-Modified по версии данных cache_scope.
+    Условный запрос с актуальной версией получает 304 без обращения
+    к БД, а тела ответов хранятся в памяти процесса до смены версии.
+    """
+
+    cache_scope = None
+    response_cache = LRUCache(RESPONSE_CACHE_SIZE)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        version = get_version(self.cache_scope)
+        path = request.get_full_path()
+        etag = quote_etag(hashlib.md5(
+            f'{self.cache_scope}:{version!r}:{path}'.encode()
+        ).hexdigest())
+        last_modified = int(version)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+        key = (self.cache_scope, version, path)
+        data = self.response_cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            self.response_cache.set(key, data)
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
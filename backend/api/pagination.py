@@ -1,5 +1,6 @@
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class LimitPagination(PageNumberPagination):
@@ -7,3 +8,78 @@ class LimitPagination(PageNumberPagination):
 
     page_size = settings.PAGE_SIZE
     page_size_query_param = 'limit'
+
+
+class LimitCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация с параметром limit.
+
+    Не выполняет COUNT(*) и не использует OFFSET:
+    следующая страница выбирается по ключу последнего объекта.
+    """
+
+    page_size = settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+
+
+class RecipeCursorPagination(LimitCursorPagination):
+    """
+    Курсорная пагинация рецептов по дате публикации.
+
+    С поиском и сортировкой по популярности курсор не используется:
+    ранг не хранится в строке, а позиция курсора DRF строится только по
+    первому полю сортировки, и при равном числе добавлений в избранное
+    страницы выбирались бы через OFFSET.
+    """
+
+    ordering = ('-pub_date', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('search', '').strip():
+            raise ValidationError({
+                'pagination': 'Курсорная пагинация недоступна для поиска.'
+            })
+        if request.query_params.get('ordering') == 'popular':
+            raise ValidationError({
+                'pagination': (
+                    'Курсорная пагинация недоступна для сортировки '
+                    'по популярности.'
+                )
+            })
+        return super().get_ordering(request, queryset, view)
+
+
+class FeedCursorPagination(LimitCursorPagination):
+    """Курсорная пагинация ленты подписок."""
+
+    ordering = ('-pub_date', '-recipe_id')
+
+
+class SubscriptionCursorPagination(LimitCursorPagination):
+    """Курсорная пагинация подписок."""
+
+    ordering = ('id',)
+
+
+class CursorPaginationMixin:
+    """
+    Позволяет включить курсорную пагинацию параметром запроса.
+
+    При ?pagination=cursor используется cursor_pagination_class,
+    иначе - обычный pagination_class.
+    """
+
+    cursor_pagination_class = None
+    pagination_mode_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            mode = self.request.query_params.get(
+                self.pagination_mode_query_param
+            )
+            if self.cursor_pagination_class and mode == 'cursor':
+                pagination_class = self.cursor_pagination_class
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
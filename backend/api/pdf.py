@@ -0,0 +1,151 @@
+"""
+Потоковая генерация простых текстовых PDF-документов.
+
+Документ отдается по частям: каждая страница формируется и отправляется
+клиенту сразу после заполнения, в памяти хранится только текущая
+страница и смещения уже записанных объектов.
+"""
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 16
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+
+
+def _cyrillic_glyphs():
+    """Соответствие символов кириллицы байтам cp1251 и именам глифов."""
+    glyphs = {'Ё': (0xA8, 'afii10023'), 'ё': (0xB8, 'afii10071'),
+              '№': (0xB9, 'afii61352')}
+    for offset in range(32):
+        upper = 10017 + offset + (offset > 5)
+        lower = 10065 + offset + (offset > 5)
+        glyphs[chr(0x0410 + offset)] = (0xC0 + offset, f'afii{upper}')
+        glyphs[chr(0x0430 + offset)] = (0xE0 + offset, f'afii{lower}')
+    return glyphs
+
+
+CYRILLIC_GLYPHS = _cyrillic_glyphs()
+
+
+def encode_text(text):
+    """Кодирует строку для шрифта с кириллической таблицей Differences."""
+    result = bytearray()
+    for char in text:
+        if char in CYRILLIC_GLYPHS:
+            result.append(CYRILLIC_GLYPHS[char][0])
+        elif 32 <= ord(char) < 127:
+            if char in '()\\':
+                result.append(ord('\\'))
+            result.append(ord(char))
+        else:
+            result.append(ord('?'))
+    return bytes(result)
+
+
+def _font_object():
+    differences = ' '.join(
+        f'{code} /{name}'
+        for code, name in sorted(CYRILLIC_GLYPHS.values())
+    )
+    return (
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        '/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+        f'/Differences [{differences}] >> >>'
+    ).encode('ascii')
+
+
+def _page_content(lines):
+    content = [
+        b'BT',
+        f'/F1 {FONT_SIZE} Tf {LEADING} TL'.encode('ascii'),
+        f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'.encode('ascii'),
+    ]
+    for line in lines:
+        content.append(b'(' + encode_text(line) + b') Tj T*')
+    content.append(b'ET')
+    return b'\n'.join(content)
+
+
+class StreamingPDF:
+    """Генератор PDF, выдающий документ постранично."""
+
+    def __init__(self, lines_per_page=LINES_PER_PAGE):
+        self.lines_per_page = lines_per_page
+        self.offsets = {}
+        self.position = 0
+        self.next_id = FONT_ID + 1
+        self.page_ids = []
+
+    def _emit(self, chunk):
+        self.position += len(chunk)
+        return chunk
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self._emit(
+            f'{object_id} 0 obj\n'.encode('ascii') + body + b'\nendobj\n'
+        )
+
+    def _allocate_id(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _page(self, lines):
+        content = _page_content(lines)
+        content_id = self._allocate_id()
+        page_id = self._allocate_id()
+        self.page_ids.append(page_id)
+        stream = (
+            f'<< /Length {len(content)} >>\nstream\n'.encode('ascii')
+            + content + b'\nendstream'
+        )
+        page = (
+            f'<< /Type /Page /Parent {PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {FONT_ID} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'
+        ).encode('ascii')
+        return self._object(content_id, stream) + self._object(page_id, page)
+
+    def _trailer(self):
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        chunk = self._object(PAGES_ID, (
+            f'<< /Type /Pages /Kids [{kids}] '
+            f'/Count {len(self.page_ids)} >>'
+        ).encode('ascii'))
+        xref_position = self.position
+        xref = [f'xref\n0 {self.next_id}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{self.offsets[object_id]:010d} 00000 n \n'
+            for object_id in range(1, self.next_id)
+        )
+        xref.append(
+            f'trailer\n<< /Size {self.next_id} /Root {CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        )
+        return chunk + ''.join(xref).encode('ascii')
+
+    def render(self, lines):
+        """Выдает байты документа по мере заполнения страниц."""
+        yield self._emit(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self._object(
+            CATALOG_ID,
+            f'<< /Type /Catalog /Pages {PAGES_ID} 0 R >>'.encode('ascii')
+        )
+        yield self._object(FONT_ID, _font_object())
+        page_lines = []
+        for line in lines:
+            page_lines.append(line)
+            if len(page_lines) == self.lines_per_page:
+                yield self._page(page_lines)
+                page_lines = []
+        if page_lines or not self.page_ids:
+            yield self._page(page_lines)
+        yield self._trailer()
@@ -0,0 +1,137 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+from datetime import datetime
+
+from rest_framework.renderers import BaseRenderer
+
+from api.pdf import StreamingPDF
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    """
+    Базовый рендерер списка покупок.
+
+    Список отдается потоково через stream(), render() используется
+    только для ответов с ошибками, которые возвращаются в виде JSON.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if renderer_context and 'response' in renderer_context:
+            renderer_context['response']['Content-Type'] = (
+                'application/json'
+            )
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    @abstractmethod
+    def stream(self, ingredients, user):
+        """Возвращает итератор частей файла со списком покупок."""
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Список покупок в текстовом виде."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def lines(self, ingredients, user):
+        today = datetime.today()
+        yield f'Список покупок для {user.get_full_name()}'
+        yield ''
+        yield f'Дата: {today:%Y-%m-%d}'
+        yield ''
+        for ingredient in ingredients:
+            yield (
+                f'- {ingredient["name"]} '
+                f'({ingredient["measurement_unit"]})'
+                f' - {ingredient["amount"]}'
+            )
+        yield ''
+        yield f'Foodgram ({today:%Y})'
+
+    def stream(self, ingredients, user):
+        return (f'{line}\n' for line in self.lines(ingredients, user))
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Список покупок в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients, user):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['measurement_unit'],
+                ingredient['amount'],
+            ))
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    """Список покупок в формате JSON."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients, user):
+        yield '{"date": %s, "ingredients": [' % json.dumps(
+            f'{datetime.today():%Y-%m-%d}'
+        )
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ', '
+        yield ']}'
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """Список покупок в формате PDF."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def stream(self, ingredients, user):
+        return StreamingPDF().render(
+            ShoppingListTextRenderer().lines(ingredients, user)
+        )
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListPDFRenderer,
+)
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Метрики в текстовом формате Prometheus."""
+
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if not isinstance(data, str):
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if response is not None:
+            response['Content-Type'] = (
+                'text/plain; version=0.0.4; charset=utf-8'
+            )
+        return data.encode('utf-8')
@@ -1,13 +1,21 @@
 from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 
 from api.fields import Base64ImageField
+from api.fragments import (FAVORITE, SHOPPING_CART, SUBSCRIPTION,
+                           get_fragments, get_memberships)
 from api.validators import validate_username
+from recipes.cache import bump_version_on_commit, recipe_scope
 from recipes.constants import RecipeConstants
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes.images import schedule_variants, variant_urls
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, ShoppingListItem,
+                            Tag, recipe_prefetches)
+from recipes.search import refresh_search_index
 from users.constants import UsersConstants
 from users.models import Subscription
 
@@ -43,10 +51,13 @@ class UsersSerializer(UserSerializer):
                   'is_subscribed',)
 
     def get_is_subscribed(self, obj):
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
-        return request.user.is_authenticated and obj.following.filter(
-            user_id=request.user.id
-        ).exists()
+        if not request.user.is_authenticated or obj.pk == request.user.pk:
+            return False
+        return obj.following.filter(user_id=request.user.id).exists()
 
 
 class MiniRecipeSerializer(serializers.ModelSerializer):
@@ -76,14 +87,19 @@ class SubscriptionSerializer(UsersSerializer):
                             'first_name', 'last_name')
 
     def get_recipes_count(self, obj):
+        recipes_count = getattr(obj, 'recipes_count', None)
+        if recipes_count is not None:
+            return recipes_count
         return obj.recipes.count()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        recipes = obj.recipes.all()
-        if limit and limit.isdigit():
-            recipes = recipes[:int(limit)]
+        recipes = getattr(obj, 'latest_recipes', None)
+        if recipes is None:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            recipes = obj.recipes.all()
+            if limit and limit.isdigit():
+                recipes = recipes[:int(limit)]
         serializer = MiniRecipeSerializer(
             recipes, many=True, read_only=True, context=self.context
         )
@@ -112,6 +128,14 @@ class SubscriptionCreateSerializer(serializers.ModelSerializer):
                 'Вы уже подписаны на этого пользователя!')
         return data
 
+    @transaction.atomic
+    def create(self, validated_data):
+        subscription = super().create(validated_data)
+        FeedEntry.objects.backfill(
+            subscription.user, subscription.following
+        )
+        return subscription
+
     def to_representation(self, instance):
         return SubscriptionSerializer(
             instance.following,
@@ -143,7 +167,12 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount',)
 
     def validate_id(self, id_value):
-        if not Ingredient.objects.filter(id=id_value).exists():
+        ingredient_ids = self.context.get('ingredient_ids')
+        if ingredient_ids is None:
+            exists = Ingredient.objects.filter(id=id_value).exists()
+        else:
+            exists = id_value in ingredient_ids
+        if not exists:
             raise serializers.ValidationError(
                 'Данный ингредиент не существует!'
             )
@@ -178,19 +207,71 @@ class RecipeIngredientDetailSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
-    """Сериализатор рецептов для безопасных запросов."""
+class AuthorSerializer(serializers.ModelSerializer):
+    """Сериализатор автора рецепта без данных текущего пользователя."""
+
+    class Meta:
+        model = User
+        fields = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Сериализатор части рецепта, общей для всех пользователей."""
 
     tags = TagSerializer(many=True, read_only=True)
-    author = UserSerializer(read_only=True)
+    author = AuthorSerializer(read_only=True)
     ingredients = RecipeIngredientDetailSerializer(
         source='recipe_ingredients', many=True
     )
-    is_favorited = serializers.SerializerMethodField(read_only=True)
-    is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = SerializerMethodField()
 
     class Meta:
         model = Recipe
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'image_variants',
+            'text',
+            'cooking_time',
+        )
+
+    def get_image_variants(self, obj):
+        urls = variant_urls(obj.image.name)
+        request = self.context.get('request')
+        if request is None:
+            return urls
+        return {
+            variant: url and request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Сериализатор списка рецептов с пакетной работой с кешем."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return self.child.represent(list(data))
+
+
+class RecipeGetSerializer(RecipeFragmentSerializer):
+    """
+    Сериализатор рецептов для безопасных запросов.
+
+    Общая часть рецептов берется из кеша фрагментов, признаки
+    избранного, корзины и подписки на автора добавляются поверх нее.
+    """
+
+    author = UsersSerializer(read_only=True)
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+
+    class Meta(RecipeFragmentSerializer.Meta):
         fields = (
             'id',
             'tags',
@@ -200,21 +281,66 @@ class RecipeGetSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
+        list_serializer_class = RecipeListSerializer
 
-    def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and user.favorites.filter(
-            recipe=obj
-        ).exists()
+    def to_representation(self, instance):
+        return self.represent([instance])[0]
 
-    def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and user.shopping_cart.filter(
-            recipe=obj
-        ).exists()
+    def build_fragments(self, recipes):
+        prefetch_related_objects(recipes, *recipe_prefetches())
+        return RecipeFragmentSerializer(
+            recipes, many=True, context=self.context
+        ).data
+
+    def get_user_flags(self, recipes):
+        user = self.context['request'].user
+        if not user.is_authenticated:
+            return get_memberships(user)
+        if all(hasattr(recipe, 'is_author_subscribed') for recipe in recipes):
+            return {
+                FAVORITE: {
+                    recipe.id for recipe in recipes if recipe.is_favorited
+                },
+                SHOPPING_CART: {
+                    recipe.id for recipe in recipes
+                    if recipe.is_in_shopping_cart
+                },
+                SUBSCRIPTION: {
+                    recipe.author_id for recipe in recipes
+                    if recipe.is_author_subscribed
+                },
+            }
+        return get_memberships(
+            user,
+            recipe_ids=[recipe.id for recipe in recipes],
+            author_ids={recipe.author_id for recipe in recipes},
+        )
+
+    def represent(self, recipes):
+        if not recipes:
+            return []
+        request = self.context['request']
+        fragments = get_fragments(
+            recipes, request.build_absolute_uri('/'), self.build_fragments
+        )
+        memberships = self.get_user_flags(recipes)
+        representation = []
+        for recipe, fragment in zip(recipes, fragments):
+            fragment['author']['is_subscribed'] = (
+                recipe.author_id in memberships[SUBSCRIPTION]
+            )
+            fragment['is_favorited'] = recipe.id in memberships[FAVORITE]
+            fragment['is_in_shopping_cart'] = (
+                recipe.id in memberships[SHOPPING_CART]
+            )
+            representation.append(
+                {field: fragment[field] for field in self.Meta.fields}
+            )
+        return representation
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -275,6 +401,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     def create_tags(self, recipe, tags_data):
         recipe.tags.set(tags_data)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('recipe_ingredients')
@@ -283,16 +410,72 @@ class RecipeSerializer(serializers.ModelSerializer):
         )
         self.create_ingredients(recipe, ingredients_data)
         self.create_tags(recipe, tags_data)
+        refresh_search_index([recipe.id])
+        FeedEntry.objects.fan_out([recipe])
         return recipe
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит состав рецепта к ingredients_data, меняя только отличия.
+
+        Возвращает изменения количеств {id ингредиента: разница}.
+        """
+        current = {
+            recipe_ingredient.ingredients_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        new_amounts = {
+            ingredient_data['ingredients']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+        deltas = {
+            ingredient_id: new_amounts.get(ingredient_id, 0) - (
+                current[ingredient_id].amount
+                if ingredient_id in current else 0
+            )
+            for ingredient_id in current.keys() | new_amounts.keys()
+        }
+        removed = [
+            recipe_ingredient.id
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in new_amounts
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in current.items():
+            if deltas[ingredient_id] and ingredient_id in new_amounts:
+                recipe_ingredient.amount = new_amounts[ingredient_id]
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        added = [
+            ingredient_data for ingredient_data in ingredients_data
+            if ingredient_data['ingredients']['id'] not in current
+        ]
+        if added:
+            self.create_ingredients(recipe, added)
+        return deltas
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients')
         tags_data = validated_data.pop('tags')
-        instance.recipe_ingredients.all().delete()
-        self.create_ingredients(instance, ingredients_data)
-        instance.tags.clear()
-        self.create_tags(instance, tags_data)
-        instance = super().update(instance, validated_data)
+        ShoppingListItem.objects.change_recipe(
+            instance, self.update_ingredients(instance, ingredients_data)
+        )
+        instance.tags.set(tags_data)
+        # Полное сохранение записало бы поверх значений в БД устаревшие
+        # tags_mask (его пересчитывает сигнал tags.set()), favorites_count
+        # и search_vector из памяти.
+        if validated_data:
+            for field, value in validated_data.items():
+                setattr(instance, field, value)
+            instance.save(update_fields=list(validated_data))
+        # bulk_update и bulk_create состава не отправляют сигналов,
+        # а без полей рецепта не будет и post_save.
+        bump_version_on_commit(recipe_scope(instance.pk))
+        refresh_search_index([instance.id])
         return instance
 
     def to_representation(self, instance):
@@ -301,6 +484,123 @@ class RecipeSerializer(serializers.ModelSerializer):
         return RecipeGetSerializer(instance, context=context).data
 
 
+def _collect_ids(values):
+    ids = set()
+    for value in values:
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+class RecipeBulkSerializer(RecipeSerializer):
+    """
+    Сериализатор рецепта при массовом создании.
+
+    Существование тегов и ингредиентов проверяется по множествам id,
+    найденным одним запросом на всю пачку в create_batch().
+    """
+
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=True
+    )
+
+    def validate_tags(self, tags_data):
+        unknown = sorted(set(tags_data) - self.context['tag_ids'])
+        if unknown:
+            raise serializers.ValidationError(
+                f'Данные теги не существуют: {unknown}!'
+            )
+        return tags_data
+
+    @classmethod
+    def create_batch(cls, items, context):
+        """
+        Проверяет и создает пачку рецептов.
+
+        Возвращает список результатов в порядке items: {'id': ...} для
+        созданных рецептов и {'errors': ...} для непрошедших проверку.
+        """
+        entries = [item for item in items if isinstance(item, dict)]
+        ingredients = [
+            ingredient for item in entries
+            for ingredient in (item.get('ingredients') or ())
+            if isinstance(ingredient, dict)
+        ]
+        context = dict(
+            context,
+            ingredient_ids=set(Ingredient.objects.filter(
+                id__in=_collect_ids(
+                    ingredient.get('id') for ingredient in ingredients
+                )
+            ).values_list('id', flat=True)),
+            tag_ids=set(Tag.objects.filter(
+                id__in=_collect_ids(
+                    tag for item in entries
+                    for tag in (item.get('tags') or ())
+                )
+            ).values_list('id', flat=True)),
+        )
+        results = []
+        valid = []
+        for item in items:
+            serializer = cls(data=item, context=context)
+            if serializer.is_valid():
+                results.append(None)
+                valid.append((len(results) - 1, serializer.validated_data))
+            else:
+                results.append({'errors': serializer.errors})
+        author = context['request'].user
+        for index, recipe in zip(
+            (index for index, _ in valid),
+            cls.bulk_create_recipes(
+                author, [validated_data for _, validated_data in valid]
+            ),
+        ):
+            results[index] = {'id': recipe.id}
+        return results
+
+    @staticmethod
+    @transaction.atomic
+    def bulk_create_recipes(author, recipes_data):
+        recipes = []
+        relations = []
+        for validated_data in recipes_data:
+            validated_data = dict(validated_data)
+            tags_data = validated_data.pop('tags')
+            ingredients_data = validated_data.pop('recipe_ingredients')
+            recipes.append(Recipe(author=author, **validated_data))
+            relations.append((tags_data, ingredients_data))
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            for recipe in recipes:
+                schedule_variants(recipe)
+        else:
+            for recipe in recipes:
+                recipe.save()
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredients_id=ingredient_data['ingredients']['id'],
+                amount=ingredient_data['amount'],
+            )
+            for recipe, (_, ingredients_data) in zip(recipes, relations)
+            for ingredient_data in ingredients_data
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+            for recipe, (tags_data, _) in zip(recipes, relations)
+            for tag_id in tags_data
+        )
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).refresh_tags_mask()
+        refresh_search_index([recipe.id for recipe in recipes])
+        FeedEntry.objects.fan_out(recipes)
+        return recipes
+
+
 class BaseRecipeActionSerializer(serializers.ModelSerializer):
     """Базовый сериализатор для Избранного и Корзины покупок."""
 
@@ -332,6 +632,14 @@ class FavoriteSerializer(BaseRecipeActionSerializer):
     class Meta(BaseRecipeActionSerializer.Meta):
         model = Favorite
 
+    @transaction.atomic
+    def create(self, validated_data):
+        favorite = super().create(validated_data)
+        Recipe.objects.filter(
+            id=favorite.recipe_id
+        ).change_favorites_count(1)
+        return favorite
+
 
 class ShoppingCartSerializer(BaseRecipeActionSerializer):
     """Сериализатор Корзины покупок."""
@@ -339,6 +647,14 @@ class ShoppingCartSerializer(BaseRecipeActionSerializer):
     class Meta(BaseRecipeActionSerializer.Meta):
         model = ShoppingCart
 
+    @transaction.atomic
+    def create(self, validated_data):
+        shopping_cart = super().create(validated_data)
+        ShoppingListItem.objects.add_recipe(
+            shopping_cart.user, shopping_cart.recipe_id
+        )
+        return shopping_cart
+
 
 class ShoppingCartDownloadSerializer(serializers.Serializer):
     """Сериализатор скачивания Корзины покупок."""
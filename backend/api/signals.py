@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.cache import bump_version_on_commit, token_scope
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Token)
+def token_changed(instance, **kwargs):
+    bump_version_on_commit(token_scope(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_credentials_changed(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    for key in Token.objects.filter(user_id=instance.pk).values_list(
+        'key', flat=True
+    ):
+        bump_version_on_commit(token_scope(key))
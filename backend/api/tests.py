@@ -0,0 +1,700 @@
+import json
+import re
+import shutil
+import tempfile
+from collections import Counter
+from unittest import skipUnless
+
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import CachedTokenAuthentication
+from api.metrics import registry
+from api.middleware import sticky_key
+from foodgram.routers import ReplicaRouter, replica_configured
+from recipes.cache import token_scope, version_key
+from recipes.constants import ReplicaConstants
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.search import FTS_TABLE
+from recipes.seeding import Seeder
+from users.models import Subscription, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': alias,
+    }
+    for alias in ('default', 'fragments')
+}
+# Кеш, который ничего не хранит: как если бы каждый ключ сразу вытеснялся.
+DUMMY_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    for alias in ('default', 'fragments')
+}
+
+# Размеры страницы, для которых сравнивается число SQL-запросов.
+PAGE_SIZES = (1, 5, 10)
+AUTHORS = 10
+WRITE_STATEMENT = re.compile(
+    r'\s*(INSERT(?: OR IGNORE)? INTO|UPDATE|DELETE FROM) "?(\w+)"?', re.I
+)
+# Объем данных проверки планов и размер таблицы, начиная с которого
+# ее полное чтение считается регрессией.
+PLAN_RECIPES = 2000
+PLAN_MIN_ROWS = 1000
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)\b(?! USING)')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=CACHES)
+class APITestBase(APITestCase):
+    """Пользователь, подписанный на авторов с рецептами в избранном."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        cls.user = cls.create_user('user')
+        for number in range(AUTHORS):
+            author = cls.create_user(f'author{number}')
+            Subscription.objects.create(user=cls.user, following=author)
+            for _ in range(2):
+                recipe = cls.create_recipe(author)
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            email=f'{username}@example.com', username=username,
+            first_name='Имя', last_name='Фамилия', password='password',
+        )
+
+    @classmethod
+    def create_recipe(cls, author, tags=None):
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание', cooking_time=10,
+            image='recipes/images/test.png',
+        )
+        recipe.tags.set(cls.tags[:2] if tags is None else tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredients=ingredient, amount=2)
+            for ingredient in cls.ingredients
+        )
+        return recipe
+
+    def setUp(self):
+        for alias in CACHES:
+            caches[alias].clear()
+        self.client.force_authenticate(self.user)
+
+
+class QueryCountTests(APITestBase):
+    """Число SQL-запросов списков не зависит от размера страницы."""
+
+    def assert_page_queries(self, url, queries):
+        separator = '&' if '?' in url else '?'
+        for limit in PAGE_SIZES:
+            with self.subTest(url=url, limit=limit):
+                for alias in CACHES:
+                    caches[alias].clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        f'{url}{separator}limit={limit}'
+                    )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_recipes_list(self):
+        self.assert_page_queries(reverse('api:recipes-list'), 4)
+
+    def test_subscriptions(self):
+        self.assert_page_queries(reverse('api:users-subscriptions'), 3)
+        self.assert_page_queries(
+            reverse('api:users-subscriptions') + '?recipes_limit=1', 3
+        )
+
+    def test_users_list(self):
+        self.assert_page_queries(reverse('api:users-list'), 2)
+
+    def test_users_me(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api:users-me'))
+        self.assertEqual(response.data['id'], self.user.id)
+        self.assertFalse(response.data['is_subscribed'])
+
+    def test_is_subscribed(self):
+        response = self.client.get(reverse('api:recipes-list'))
+        for recipe in response.data['results']:
+            self.assertTrue(recipe['author']['is_subscribed'])
+        response = self.client.get(reverse('api:users-list') + '?limit=100')
+        for user in response.data['results']:
+            self.assertEqual(user['is_subscribed'], user['id'] != self.user.id)
+
+
+class CatalogCacheTests(APITestBase):
+    """Условные запросы к справочникам."""
+
+    def test_ingredient_search_not_modified(self):
+        url = reverse('api:ingredients-list') + '?name=ингр'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), len(self.ingredients))
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CACHES=DUMMY_CACHES)
+    def test_lost_versions(self):
+        for url in (reverse('api:tags-list'),
+                    reverse('api:ingredients-list') + '?name=ингр'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class FragmentCacheTests(APITestBase):
+    """Кеш фрагментов рецептов."""
+
+    @override_settings(CACHES=DUMMY_CACHES)
+    def test_lost_versions(self):
+        response = self.client.get(reverse('api:recipes-list') + '?limit=10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def get_recipes(self):
+        response = self.client.get(reverse('api:recipes-list') + '?limit=50')
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id']: recipe for recipe in response.data['results']}
+
+    def change(self, action):
+        """Прогревает кеш, выполняет action и возвращает свежий список."""
+        self.get_recipes()
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        return self.get_recipes()
+
+    def test_recipe_create(self):
+        created = []
+        recipes = self.change(
+            lambda: created.append(self.create_recipe(self.user))
+        )
+        self.assertIn(created[0].id, recipes)
+
+    def test_recipe_update(self):
+        recipe = self.create_recipe(self.user)
+        recipes = self.change(lambda: self.client.patch(
+            reverse('api:recipes-detail', args=(recipe.id,)),
+            {
+                'name': 'Новое название',
+                'tags': [tag.id for tag in self.tags[:2]],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 2}
+                    for ingredient in self.ingredients
+                ],
+            },
+            format='json',
+        ))
+        self.assertEqual(recipes[recipe.id]['name'], 'Новое название')
+
+    def test_recipe_delete(self):
+        recipe = self.create_recipe(self.user)
+        recipes = self.change(lambda: self.client.delete(
+            reverse('api:recipes-detail', args=(recipe.id,))
+        ))
+        self.assertNotIn(recipe.id, recipes)
+
+    def test_amount_change(self):
+        recipe_ingredient = RecipeIngredient.objects.first()
+        recipe_ingredient.amount = 9
+        recipes = self.change(recipe_ingredient.save)
+        self.assertIn(9, [
+            ingredient['amount'] for ingredient
+            in recipes[recipe_ingredient.recipe_id]['ingredients']
+        ])
+
+    def test_tag_edit(self):
+        tag = self.tags[0]
+        tag.name = 'Новый тег'
+        recipes = self.change(tag.save)
+        self.assertIn('Новый тег', [
+            recipe_tag['name']
+            for recipe in recipes.values() for recipe_tag in recipe['tags']
+        ])
+
+    def test_ingredient_edit(self):
+        ingredient = self.ingredients[0]
+        ingredient.name = 'новый ингредиент'
+        recipes = self.change(ingredient.save)
+        self.assertIn('новый ингредиент', [
+            recipe_ingredient['name']
+            for recipe in recipes.values()
+            for recipe_ingredient in recipe['ingredients']
+        ])
+
+    def test_author_rename(self):
+        author = User.objects.get(username='author0')
+        author.username = 'renamed'
+        recipes = self.change(author.save)
+        self.assertIn('renamed', [
+            recipe['author']['username'] for recipe in recipes.values()
+        ])
+
+
+class ImageFieldTests(APITestBase):
+    """Картинка рецепта в формате data URI."""
+
+    def test_malformed_data_uri(self):
+        for image in ('data:image/png,abc', 'data:image/png;base64,@@@'):
+            with self.subTest(image=image):
+                response = self.client.post(
+                    reverse('api:recipes-list'),
+                    {
+                        'name': 'Рецепт',
+                        'text': 'Описание',
+                        'cooking_time': 10,
+                        'image': image,
+                        'tags': [self.tags[0].id],
+                        'ingredients': [
+                            {'id': self.ingredients[0].id, 'amount': 1}
+                        ],
+                    },
+                    format='json',
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.data)
+
+
+class RecipeUpdateTests(APITestBase):
+    """Изменение рецепта."""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self.create_recipe(self.user)
+        self.url = reverse('api:recipes-detail', args=(self.recipe.id,))
+        self.data = {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tag.id for tag in self.tags[:2]],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 2}
+                for ingredient in self.ingredients
+            ],
+        }
+
+    def patch(self, data):
+        """
+        PATCH рецепта.
+
+        Возвращает число записей в БД по оператору и таблице без
+        обновлений поискового индекса, которые зависят от СУБД.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        writes = Counter()
+        for query in context.captured_queries:
+            match = WRITE_STATEMENT.match(query['sql'])
+            if (match and FTS_TABLE not in query['sql']
+                    and 'SET search_vector' not in query['sql']):
+                writes[(match.group(1).split()[0].upper(),
+                        match.group(2))] += 1
+        return writes
+
+    def test_edit_shapes_writes(self):
+        recipe, link, tags = (
+            Recipe._meta.db_table,
+            RecipeIngredient._meta.db_table,
+            Recipe.tags.through._meta.db_table,
+        )
+        new_ingredient = Ingredient.objects.create(
+            name='Новый ингредиент', measurement_unit='г'
+        )
+        shapes = (
+            ('title', {'name': 'Новое название'},
+             {('UPDATE', recipe): 1}),
+            ('amount', {'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 5},
+                *self.data['ingredients'][1:],
+            ]}, {('UPDATE', recipe): 1, ('UPDATE', link): 1}),
+            ('add ingredient', {'ingredients': [
+                *self.data['ingredients'],
+                {'id': new_ingredient.id, 'amount': 1},
+            ]}, {('UPDATE', recipe): 1, ('INSERT', link): 1}),
+            ('remove ingredient', {
+                'ingredients': self.data['ingredients'][1:]
+            }, {('UPDATE', recipe): 1, ('DELETE', link): 1}),
+            # tags.set() удаляет и добавляет связи, после каждого шага
+            # сигнал пересчитывает tags_mask.
+            ('tags', {'tags': [self.tags[2].id]},
+             {('UPDATE', recipe): 3, ('DELETE', tags): 1,
+              ('INSERT', tags): 1}),
+        )
+        for shape, change, expected in shapes:
+            with self.subTest(shape=shape):
+                self.assertEqual(
+                    self.patch(dict(self.data, **change)), Counter(expected)
+                )
+                self.patch(self.data)
+
+    def test_composition_only_update(self):
+        self.client.get(self.url)
+        ingredients = [
+            {'id': ingredient.id, 'amount': 7}
+            for ingredient in self.ingredients
+        ]
+        # В тестах транзакция не фиксируется, и смена версии рецепта
+        # выполняется при выходе из блока, то есть уже после ответа.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                self.url,
+                {'ingredients': ingredients, 'tags': self.data['tags']},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [ingredient['amount']
+             for ingredient in response.data['ingredients']],
+            [7] * len(self.ingredients),
+        )
+
+    def test_tags_change_updates_filter(self):
+        self.data['tags'] = [self.tags[2].id]
+        self.patch(self.data)
+        url = reverse('api:recipes-list')
+        for tag, found in ((self.tags[2], True), (self.tags[0], False)):
+            with self.subTest(tag=tag.slug):
+                response = self.client.get(f'{url}?tags={tag.slug}')
+                self.assertEqual(
+                    self.recipe.id in {
+                        recipe['id'] for recipe in response.data['results']
+                    },
+                    found,
+                )
+
+
+class CursorPaginationTests(APITestBase):
+    """Курсорная пагинация рецептов."""
+
+    def test_popular_rejected(self):
+        response = self.client.get(
+            reverse('api:recipes-list') + '?pagination=cursor&ordering=popular'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pagination', response.data)
+
+    def test_search_rejected(self):
+        response = self.client.get(
+            reverse('api:recipes-list') + '?pagination=cursor&search=рецепт'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class QueryPlanTests(APITestBase):
+    """Запросы основных эндпоинтов не читают большие таблицы целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        users = PLAN_RECIPES // 10
+        Seeder().run(
+            users=users,
+            recipes=PLAN_RECIPES,
+            favorites=PLAN_RECIPES * 5,
+            carts=users,
+            subscriptions=users * 5,
+            feed_users=1,
+        )
+
+    def endpoints(self, user):
+        recipe = Recipe.objects.first()
+        return (
+            reverse('api:recipes-list'),
+            reverse('api:recipes-list') + '?is_favorited=1',
+            reverse('api:recipes-list') + '?is_in_shopping_cart=1',
+            reverse('api:recipes-list') + f'?author={user.id}',
+            reverse('api:recipes-list') + '?ordering=popular',
+            reverse('api:recipes-list') + f'?tags={self.tags[0].slug}',
+            reverse('api:recipes-list')
+            + f'?search={recipe.name.split()[0]}',
+            reverse('api:recipes-detail', args=(recipe.id,)),
+            reverse('api:recipes-feed'),
+            reverse('api:recipes-download-shopping-cart'),
+            reverse('api:users-list'),
+            reverse('api:users-subscriptions'),
+            reverse('api:ingredients-list')
+            + f'?name={self.ingredients[0].name[:3]}',
+        )
+
+    def test_no_full_scans(self):
+        user = User.objects.annotate(
+            subscriptions_count=Count('follower')
+        ).order_by('-subscriptions_count').first()
+        self.client.force_authenticate(user)
+        large_tables = self.large_tables()
+        self.assertIn(Recipe._meta.db_table, large_tables)
+        for url in self.endpoints(user):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    response = self.client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                scans = set()
+                for query in context.captured_queries:
+                    sql = query['sql']
+                    if sql.startswith('SELECT') and ' WHERE ' in sql:
+                        scans |= self.full_scans(sql) & large_tables
+                self.assertEqual(scans, set())
+
+    @staticmethod
+    def large_tables():
+        tables = set()
+        with connection.cursor() as cursor:
+            for table in connection.introspection.django_table_names(
+                only_existing=True
+            ):
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                if cursor.fetchone()[0] >= PLAN_MIN_ROWS:
+                    tables.add(table)
+        return tables
+
+    def full_scans(self, sql):
+        """
+        Таблицы, которые план запроса читает целиком.
+
+        Обход таблицы по индексу ради сортировки полным чтением не
+        считается: с LIMIT он останавливается на первой странице.
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return set(self.postgresql_scans(plan[0]['Plan']))
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return {
+                match.group(1)
+                for *_, detail in cursor.fetchall()
+                for match in [SQLITE_SCAN.match(detail)] if match
+            }
+
+    def postgresql_scans(self, node):
+        if node.get('Node Type') == 'Seq Scan':
+            yield node['Relation Name']
+        for child in node.get('Plans', ()):
+            yield from self.postgresql_scans(child)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+class ServerTimingTests(APITestBase):
+    """Замеры запросов в Server-Timing и гистограммах."""
+
+    def setUp(self):
+        super().setUp()
+        registry.clear()
+
+    def queries(self, view_name):
+        return registry.histograms[(view_name, 'GET')]['db_queries'].sum
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('api:recipes-list'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertGreater(self.queries('api:recipes-list'), 0)
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('api:recipes-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_server_timing_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        response = self.client.get(reverse('api:recipes-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    def test_streaming_response(self):
+        response = self.client.get(
+            reverse('api:recipes-download-shopping-cart')
+        )
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertNotIn(
+            ('api:recipes-download-shopping-cart', 'GET'),
+            registry.histograms,
+        )
+        b''.join(response.streaming_content)
+        self.assertGreater(
+            self.queries('api:recipes-download-shopping-cart'), 0
+        )
+
+
+class TokenCacheTests(APITestBase):
+    """Кеш токенов аутентификации и отзыв токенов."""
+
+    def setUp(self):
+        super().setUp()
+        CachedTokenAuthentication.cache.clear()
+        self.client.force_authenticate(None)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        # Первый запрос создает версию токена, второй кеширует токен.
+        for _ in range(2):
+            self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNotNone(
+            CachedTokenAuthentication.cache.get(self.token.key)
+        )
+
+    def get_me(self):
+        return self.client.get(reverse('api:users-me'))
+
+    def assert_revoked(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        self.assertEqual(self.get_me().status_code, 401)
+
+    def test_unknown_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+        self.assertEqual(self.get_me().status_code, 401)
+        self.assertIsNone(
+            caches['default'].get(version_key(token_scope('unknown')))
+        )
+
+    def test_logout(self):
+        self.assert_revoked(
+            lambda: self.client.post(reverse('api:logout'))
+        )
+
+    def test_token_delete(self):
+        self.assert_revoked(self.token.delete)
+
+    def test_password_change(self):
+        # Смена пароля не удаляет токен, но запись кеша с прежним
+        # пользователем должна быть перечитана из БД.
+        self.user.set_password('new-password')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.get_me().status_code, 200)
+        user, *_ = CachedTokenAuthentication.cache.get(self.token.key)
+        self.assertEqual(user.password, self.user.password)
+
+    def test_deactivation(self):
+        self.user.is_active = False
+        self.assert_revoked(self.user.save)
+
+    def test_deactivation_bypassing_signals(self):
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        # Без сигналов версия токена не меняется: токен действует до
+        # истечения TOKEN_CACHE_TTL.
+        self.assertEqual(self.get_me().status_code, 200)
+        with override_settings(TOKEN_CACHE_TTL=0):
+            CachedTokenAuthentication.cache.clear()
+            self.get_me()
+        self.assertEqual(self.get_me().status_code, 401)
+
+
+@skipUnless(
+    replica_configured(), 'Реплика настроена в foodgram.settings_test.'
+)
+@override_settings(DATABASE_ROUTERS=['foodgram.routers.ReplicaRouter'])
+class ReplicaRoutingTests(APITestBase):
+    """
+    Чтения из реплики и закрепление клиента за основной базой.
+
+    Реплика - отдельная пустая база SQLite, поэтому данные ответа
+    показывают, из какой базы он прочитан.
+    """
+
+    databases = (
+        {DEFAULT_DB_ALIAS, ReplicaConstants.ALIAS} if replica_configured()
+        else {DEFAULT_DB_ALIAS}
+    )
+
+    def setUp(self):
+        super().setUp()
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.sticky = sticky_key(token_scope(token.key))
+        self.recipe = self.create_recipe(self.create_user('replica_author'))
+
+    def request(self, method, url, alias):
+        """Запрос, все SQL-запросы которого должны уйти в alias."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(
+                connections[ReplicaConstants.ALIAS]
+            ) as replica:
+                response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400, response.data)
+        queries = {
+            DEFAULT_DB_ALIAS: len(primary),
+            ReplicaConstants.ALIAS: len(replica),
+        }
+        self.assertGreater(queries.pop(alias), 0)
+        self.assertEqual(set(queries.values()), {0}, queries)
+        return response
+
+    def favorited_ids(self, alias):
+        response = self.request(
+            'get', reverse('api:recipes-list') + '?is_favorited=1', alias
+        )
+        return {recipe['id'] for recipe in response.data['results']}
+
+    def test_read_your_writes(self):
+        # Первые запросы читают токен из основной базы: первый создает
+        # версию токена, второй кеширует токен.
+        for _ in range(2):
+            self.client.get(reverse('api:recipes-list'))
+        response = self.request(
+            'get', reverse('api:recipes-list'), ReplicaConstants.ALIAS
+        )
+        self.assertEqual(response.data['count'], 0)
+        self.request(
+            'post', reverse('api:recipes-favorite', args=(self.recipe.id,)),
+            DEFAULT_DB_ALIAS,
+        )
+        self.assertIn(self.recipe.id, self.favorited_ids(DEFAULT_DB_ALIAS))
+        caches['default'].delete(self.sticky)
+        self.assertEqual(self.favorited_ids(ReplicaConstants.ALIAS), set())
+
+    def test_failed_write_not_sticky(self):
+        self.client.post(reverse('api:recipes-favorite', args=(0,)))
+        self.assertIsNone(caches['default'].get(self.sticky))
+
+    def test_write_uses_primary(self):
+        recipe = Recipe(id=self.recipe.id)
+        recipe._state.db = ReplicaConstants.ALIAS
+        self.assertEqual(
+            ReplicaRouter().db_for_write(Recipe, instance=recipe),
+            DEFAULT_DB_ALIAS,
+        )
@@ -1,7 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from .views import (IngredientViewSet, MetricsView, RecipeViewSet, TagViewSet,
+                    UserViewSet)
 
 app_name = 'api'
 
@@ -13,6 +14,7 @@ router_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register('users', UserViewSet, basename='users')
 
 urlpatterns = [
+    path('metrics', MetricsView.as_view(), name='metrics'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,54 +1,129 @@
-from datetime import datetime
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.filters import IngredientSearchFilter, RecipeFilter
-from api.pagination import LimitPagination
+from api.filters import RecipeFilter
+from api.metrics import registry
+from api.mixins import CatalogCacheMixin
+from api.pagination import (CursorPaginationMixin, FeedCursorPagination,
+                            LimitPagination, RecipeCursorPagination,
+                            SubscriptionCursorPagination)
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import SHOPPING_LIST_RENDERERS, PrometheusRenderer
 from api.serializers import (FavoriteSerializer, IngredientSerializer,
-                             RecipeGetSerializer, RecipeSerializer,
+                             RecipeBulkSerializer, RecipeGetSerializer,
+                             RecipeSerializer,
                              ShoppingCartSerializer,
                              SubscriptionCreateSerializer,
                              SubscriptionSerializer, TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes.constants import RecipeConstants, ShoppingListConstants
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
 from users.models import Subscription
 
 User = get_user_model()
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
-    """Вьюсет для ингредиентов."""
+class IngredientViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Вьюсет для ингредиентов.
+
+    Поиск по ?name= обслуживается индексом в памяти без обращения к БД.
+    """
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    authentication_classes = ()
+    cache_scope = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name'):
+            return self.cached_response(self.search, request)
+        return super().list(request, *args, **kwargs)
+
+    def search(self, request):
+        return Response(ingredient_index.search(request.query_params['name']))
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeGetSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = LimitPagination
+    cursor_pagination_class = RecipeCursorPagination
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.select_related('author').with_user_flags(
+                self.request.user
+            )
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return RecipeGetSerializer
         return RecipeSerializer
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingListItem.objects.remove_recipe_from_carts(instance)
+        instance.delete()
+
+    @action(detail=False, permission_classes=(permissions.IsAuthenticated,))
+    def feed(self, request):
+        paginator = FeedCursorPagination()
+        entries = paginator.paginate_queryset(
+            FeedEntry.objects.filter(user=request.user), request, view=self
+        )
+        recipes = Recipe.objects.filter(
+            id__in=[entry.recipe_id for entry in entries]
+        ).select_related('author').with_user_flags(request.user).in_bulk()
+        serializer = RecipeGetSerializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=('POST',), detail=False,
+            permission_classes=(permissions.IsAuthenticated,))
+    def bulk(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {'errors': 'Ожидается непустой список рецептов.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        context = self.get_serializer_context()
+        results = []
+        for start in range(
+            0, len(request.data), RecipeConstants.BULK_BATCH_SIZE
+        ):
+            results.extend(RecipeBulkSerializer.create_batch(
+                request.data[start:start + RecipeConstants.BULK_BATCH_SIZE],
+                context,
+            ))
+        created = any('id' in result for result in results)
+        return Response(
+            {'results': results},
+            status=(status.HTTP_201_CREATED if created
+                    else status.HTTP_400_BAD_REQUEST)
+        )
+
     def perform_action(self, serializer_class, user, pk):
         serializer = serializer_class(
             data={'user': user.id, 'recipe': pk},
@@ -63,51 +138,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.perform_action(FavoriteSerializer, request.user, pk)
 
     @favorite.mapping.delete
+    @transaction.atomic
     def delete_favorite(self, request, pk=None):
-        return self.delete_recipe(Favorite, request.user, pk)
+        response = self.delete_recipe(Favorite, request.user, pk)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            Recipe.objects.filter(id=pk).change_favorites_count(-1)
+        return response
 
     @action(methods=('POST',), detail=True)
     def shopping_cart(self, request, pk):
         return self.perform_action(ShoppingCartSerializer, request.user, pk)
 
     @shopping_cart.mapping.delete
+    @transaction.atomic
     def delete_shopping_cart(self, request, pk=None):
-        return self.delete_recipe(ShoppingCart, request.user, pk)
+        response = self.delete_recipe(ShoppingCart, request.user, pk)
+        if response.status_code == status.HTTP_204_NO_CONTENT:
+            ShoppingListItem.objects.remove_recipe(request.user, pk)
+        return response
 
     @action(detail=False, methods=('get',),
-            permission_classes=(permissions.IsAuthenticated,))
+            permission_classes=(permissions.IsAuthenticated,),
+            renderer_classes=SHOPPING_LIST_RENDERERS)
     def download_shopping_cart(self, request):
         ingredients = self.get_shopping_cart_items(request.user)
-        shopping_list_text = self.prepare_shopping_list_text(
-            ingredients, request.user
+        return self.download_shopping_list(
+            request.accepted_renderer, ingredients, request.user
         )
-        return self.download_shopping_list(shopping_list_text, request.user)
 
     def get_shopping_cart_items(self, user):
-        return RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
-            'ingredients__name',
-            'ingredients__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-    def prepare_shopping_list_text(self, ingredients, user):
-        today = datetime.today()
-        user_full_name = user.get_full_name()
-        shopping_list = f'Список покупок для {user_full_name}\n\n'
-        shopping_list += f'Дата: {today:%Y-%m-%d}\n\n'
-        shopping_list += '\n'.join((
-            f'- {ingredient["ingredients__name"]} '
-            f'({ingredient["ingredients__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ))
-        shopping_list += f'\n\nFoodgram ({today:%Y})'
-        return shopping_list
+        return ShoppingListItem.objects.filter(user=user).values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('name')
 
-    def download_shopping_list(self, shopping_list_text, user):
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list_text, content_type='text/plain')
+    def download_shopping_list(self, renderer, ingredients, user):
+        filename = f'{user.username}_shopping_list.{renderer.format}'
+        content = renderer.stream(
+            ingredients.iterator(
+                chunk_size=ShoppingListConstants.CHUNK_SIZE
+            ),
+            user
+        )
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
@@ -122,18 +199,24 @@ class RecipeViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    authentication_classes = ()
+    cache_scope = 'tags'
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(CursorPaginationMixin, UserViewSet):
     """Вьюсет для пользователей."""
 
     queryset = User.objects.all()
     pagination_class = LimitPagination
+    cursor_pagination_class = SubscriptionCursorPagination
+
+    def get_queryset(self):
+        return super().get_queryset().with_is_subscribed(self.request.user)
 
     def get_permissions(self):
         if self.action == 'me':
@@ -157,18 +240,49 @@ class UserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def delete_subscribe(self, request, **kwargs):
-        get_object_or_404(
+        subscription = get_object_or_404(
             Subscription,
             user=self.request.user,
             following=self.kwargs.get('id')
-        ).delete()
+        )
+        subscription.delete()
+        FeedEntry.objects.prune(request.user, subscription.following_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, permission_classes=(permissions.IsAuthenticated,))
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            recipes_count=Count('recipes')
+        ).with_is_subscribed(request.user).order_by('username')
         pages = self.paginate_queryset(queryset)
+        self.attach_latest_recipes(pages, request.query_params.get(
+            'recipes_limit'
+        ))
         serializer = SubscriptionSerializer(pages, many=True,
                                             context={'request': request})
         return self.get_paginated_response(serializer.data)
+
+    def attach_latest_recipes(self, authors, limit):
+        """Подгружает последние рецепты авторов страницы одним запросом."""
+        limit = int(limit) if limit and limit.isdigit() else None
+        recipes_by_author = {author.id: [] for author in authors}
+        for recipe in Recipe.objects.latest_by_author(
+            recipes_by_author, limit
+        ):
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes_by_author[author.id]
+
+
+class MetricsView(APIView):
+    """Гистограммы замеров запросов для Prometheus."""
+
+    permission_classes = (permissions.IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(registry.prometheus())
@@ -0,0 +1,7 @@
+class BenchmarkConstants:
+    REQUESTS = 200
+    CONCURRENCY = 4
+    WARMUP = 5
+    PERCENTILES = (50, 95, 99)
+    REGRESSION_THRESHOLD = 0.2
+    QUERIES_TOLERANCE = 0.5
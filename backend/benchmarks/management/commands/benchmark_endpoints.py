@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from benchmarks import report
+from benchmarks.constants import BenchmarkConstants
+from benchmarks.runner import EndpointBenchmark, discover_routes, user_token
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержек, пропускной способности и числа SQL-запросов '
+        'эндпоинтов API на заполненной базе'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=BenchmarkConstants.REQUESTS,
+            help='Количество запросов к каждому маршруту',
+        )
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=BenchmarkConstants.CONCURRENCY,
+            help='Количество параллельных потоков',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=BenchmarkConstants.WARMUP,
+            help='Количество прогревочных запросов перед замером',
+        )
+        parser.add_argument(
+            '--routes',
+            help='Регулярное выражение для отбора маршрутов по метке',
+        )
+        parser.add_argument(
+            '--user', help='Email пользователя, от имени которого идут '
+                           'запросы (по умолчанию - с наибольшим числом '
+                           'подписок)',
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Файл с результатами прошлого прогона для сравнения',
+        )
+        parser.add_argument(
+            '--threshold', type=float,
+            default=BenchmarkConstants.REGRESSION_THRESHOLD,
+            help='Допустимый относительный рост p95',
+        )
+
+    def handle(self, *args, **options):
+        if not Recipe.objects.exists():
+            raise CommandError(
+                'В базе нет рецептов, выполните seed_load_data.'
+            )
+        user = self.get_user(options['user'])
+        token = user_token(user)
+        routes, skipped = discover_routes(user)
+        if options['routes']:
+            pattern = re.compile(options['routes'])
+            routes = {
+                label: path for label, path in routes.items()
+                if pattern.search(label)
+            }
+        results = {
+            'created': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'recipes': Recipe.objects.count(),
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'routes': {},
+        }
+        for label, path in routes.items():
+            results['routes'][label] = EndpointBenchmark(
+                path, token,
+                requests=options['requests'],
+                concurrency=options['concurrency'],
+                warmup=options['warmup'],
+            ).run()
+        self.stdout.write(report.format_table(results['routes']))
+        if skipped:
+            self.stdout.write(
+                'Без GET, не замерялись: ' + ', '.join(skipped)
+            )
+        if options['output']:
+            report.save(options['output'], results)
+        if options['baseline']:
+            self.compare(options['baseline'], results, options['threshold'])
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        user = User.objects.annotate(
+            subscriptions_count=Count('follower')
+        ).order_by('-subscriptions_count').first()
+        if user is None:
+            raise CommandError('В базе нет пользователей.')
+        return user
+
+    def compare(self, baseline, results, threshold):
+        lines, regressions = report.compare(
+            report.load(baseline), results, threshold
+        )
+        self.stdout.write('\n'.join(lines))
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
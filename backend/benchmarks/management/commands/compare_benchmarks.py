@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks import report
+from benchmarks.constants import BenchmarkConstants
+
+
+class Command(BaseCommand):
+    help = 'Сравнение двух прогонов benchmark_endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Результаты прошлого прогона')
+        parser.add_argument('current', help='Результаты нового прогона')
+        parser.add_argument(
+            '--threshold', type=float,
+            default=BenchmarkConstants.REGRESSION_THRESHOLD,
+            help='Допустимый относительный рост p95',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            baseline = report.load(options['baseline'])
+            current = report.load(options['current'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать результаты: {error}')
+        lines, regressions = report.compare(
+            baseline, current, options['threshold']
+        )
+        self.stdout.write('\n'.join(lines))
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,67 @@
+"""Сохранение результатов замеров и сравнение двух прогонов."""
+import json
+
+from benchmarks.constants import BenchmarkConstants
+
+COLUMNS = (
+    ('p50_ms', 'p50, мс'),
+    ('p95_ms', 'p95, мс'),
+    ('p99_ms', 'p99, мс'),
+    ('throughput', 'запр/с'),
+    ('queries_mean', 'SQL'),
+    ('errors', 'ошибки'),
+)
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def format_table(routes):
+    """Таблица результатов по маршрутам."""
+    width = max((len(label) for label in routes), default=0)
+    lines = [
+        ' '.join([' ' * width] + [f'{title:>9}' for _, title in COLUMNS])
+    ]
+    for label, stats in routes.items():
+        lines.append(' '.join(
+            [label.ljust(width)]
+            + [f'{stats[key]:>9.1f}' for key, _ in COLUMNS]
+        ))
+    return '\n'.join(lines)
+
+
+def compare(baseline, current,
+            threshold=BenchmarkConstants.REGRESSION_THRESHOLD):
+    """
+    Сравнивает два прогона.
+
+    Регрессия - рост p95 больше чем на threshold, рост среднего числа
+    SQL-запросов или появление ошибок. Возвращает список строк с
+    изменениями и список регрессий.
+    """
+    lines, regressions = [], []
+    for label, stats in current['routes'].items():
+        before = baseline['routes'].get(label)
+        if before is None:
+            lines.append(f'{label}: новый маршрут')
+            continue
+        change = stats['p95_ms'] / before['p95_ms'] - 1
+        queries = stats['queries_mean'] - before['queries_mean']
+        line = (
+            f'{label}: p95 {before["p95_ms"]:.1f} -> {stats["p95_ms"]:.1f} '
+            f'мс ({change:+.0%}), SQL {before["queries_mean"]:.1f} -> '
+            f'{stats["queries_mean"]:.1f}'
+        )
+        lines.append(line)
+        if (change > threshold
+                or queries > BenchmarkConstants.QUERIES_TOLERANCE
+                or stats['errors'] > before['errors']):
+            regressions.append(line)
+    return lines, regressions
@@ -0,0 +1,215 @@
+"""
+Нагрузочный прогон эндпоинтов API внутри процесса.
+
+Запросы проходят через URLconf проекта и все middleware с помощью
+тестового клиента Django. Каждый поток использует свой клиент и свое
+соединение с базой, SQL-запросы считаются через execute_wrapper, без
+сохранения текста запросов.
+"""
+import math
+import threading
+import time
+from collections import Counter
+
+from django.db import connection
+from django.test import Client
+from django.urls import URLResolver, reverse
+from rest_framework.authtoken.models import Token
+
+from api import urls as api_urls
+from benchmarks.constants import BenchmarkConstants
+from recipes.models import Ingredient, Recipe, Tag
+
+# Запросы с фильтрами, которые проверяются в дополнение к маршрутам.
+EXTRA_QUERIES = (
+    ('recipes-list', '?is_favorited=1'),
+    ('recipes-list', '?is_in_shopping_cart=1'),
+    ('recipes-list', '?ordering=popular'),
+    ('recipes-list', '?tags={tag}'),
+    ('users-subscriptions', '?recipes_limit=3'),
+)
+# Служебные маршруты, которые не замеряются.
+EXCLUDED_ROUTES = ('metrics',)
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def allows_get(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return 'get' in actions
+    view_class = (getattr(callback, 'cls', None)
+                  or getattr(callback, 'view_class', None))
+    return view_class is not None and hasattr(view_class, 'get')
+
+
+def lookup_values(user):
+    """id объектов, подставляемые в маршруты по префиксу имени."""
+    recipe = Recipe.objects.order_by('-favorites_count', '-id').first()
+    tag = Tag.objects.first()
+    ingredient = Ingredient.objects.order_by('id').first()
+    return {
+        'recipes': recipe and recipe.id,
+        'tags': tag and tag.id,
+        'ingredients': ingredient and ingredient.id,
+        'users': recipe.author_id if recipe else user.id,
+        'user': recipe.author_id if recipe else user.id,
+        'tag': tag and tag.slug,
+    }
+
+
+def discover_routes(user):
+    """
+    Маршруты api/urls.py.
+
+    Возвращает словарь {метка: путь} для маршрутов с GET и список меток
+    остальных маршрутов. В метке вместо id стоит имя параметра: /:pk/.
+    """
+    values = lookup_values(user)
+    routes, names, skipped = {}, {}, []
+    for pattern in iter_patterns(api_urls.urlpatterns):
+        groups = list(pattern.pattern.regex.groupindex)
+        if (not pattern.name or pattern.name in EXCLUDED_ROUTES
+                or 'format' in groups):
+            continue
+        name = f'{api_urls.app_name}:{pattern.name}'
+        label = reverse(name, kwargs={group: f':{group}' for group in groups})
+        if label in routes or label in skipped:
+            continue
+        if not allows_get(pattern.callback):
+            skipped.append(label)
+            continue
+        value = values.get(pattern.name.split('-')[0])
+        if groups and value is None:
+            skipped.append(label)
+            continue
+        routes[label] = reverse(
+            name, kwargs={group: value for group in groups}
+        )
+        names[pattern.name] = label
+    for name, query in EXTRA_QUERIES:
+        if name not in names or '{tag}' in query and values['tag'] is None:
+            continue
+        query = query.format(tag=values['tag'])
+        routes[names[name] + query] = routes[names[name]] + query
+    return routes, skipped
+
+
+def percentile(values, percent):
+    """Процентиль по методу ближайшего ранга для отсортированных values."""
+    if not values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class EndpointBenchmark:
+    """Замер одного пути в нескольких потоках."""
+
+    def __init__(self, path, token, requests=BenchmarkConstants.REQUESTS,
+                 concurrency=BenchmarkConstants.CONCURRENCY,
+                 warmup=BenchmarkConstants.WARMUP):
+        self.path = path
+        self.token = token
+        self.requests = requests
+        self.concurrency = max(min(concurrency, requests), 1)
+        self.warmup = warmup
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.queries = []
+        self.statuses = Counter()
+
+    def client(self):
+        return Client(
+            SERVER_NAME='localhost',
+            HTTP_AUTHORIZATION=f'Token {self.token}',
+        )
+
+    def get(self, client):
+        """GET пути с чтением всего тела, в том числе потокового."""
+        response = client.get(self.path)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    def worker(self, barrier, count):
+        client = self.client()
+        latencies, queries, statuses = [], [], Counter()
+        executed = []
+
+        def count_query(execute, sql, params, many, context):
+            executed.append(1)
+            return execute(sql, params, many, context)
+
+        try:
+            barrier.wait()
+            with connection.execute_wrapper(count_query):
+                for _ in range(count):
+                    executed.clear()
+                    started = time.perf_counter()
+                    response = self.get(client)
+                    latencies.append(time.perf_counter() - started)
+                    queries.append(len(executed))
+                    statuses[response.status_code] += 1
+        finally:
+            connection.close()
+        with self.lock:
+            self.latencies.extend(latencies)
+            self.queries.extend(queries)
+            self.statuses.update(statuses)
+
+    def run(self):
+        client = self.client()
+        for _ in range(self.warmup):
+            self.get(client)
+        share, remainder = divmod(self.requests, self.concurrency)
+        barrier = threading.Barrier(self.concurrency + 1)
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(barrier, share + (number < remainder)),
+            )
+            for number in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return self.stats(time.perf_counter() - started)
+
+    def stats(self, elapsed):
+        latencies = sorted(self.latencies)
+        result = {
+            'path': self.path,
+            'requests': len(latencies),
+            'concurrency': self.concurrency,
+            'errors': sum(
+                count for status, count in self.statuses.items()
+                if status >= 400
+            ),
+            'statuses': {
+                str(status): count for status, count in self.statuses.items()
+            },
+            'throughput': len(latencies) / elapsed if elapsed else None,
+            'mean_ms': sum(latencies) / len(latencies) * 1000,
+            'max_ms': latencies[-1] * 1000,
+            'queries_mean': sum(self.queries) / len(self.queries),
+            'queries_max': max(self.queries),
+        }
+        for percent in BenchmarkConstants.PERCENTILES:
+            result[f'p{percent}_ms'] = percentile(latencies, percent) * 1000
+        return result
+
+
+def user_token(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    return token.key
@@ -0,0 +1,57 @@
+"""
+Маршрутизация запросов между основной базой и репликой.
+
+Реплика используется только внутри use_replica(), который включает
+ReplicaRoutingMiddleware для безопасных запросов. Записи, а также
+чтения вне запросов (команды, фоновые потоки) идут в основную базу.
+Токены и сессии всегда читаются из основной базы: только что
+выданный токен может еще не дойти до реплики.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from recipes.constants import ReplicaConstants
+
+PRIMARY_APPS = ('authtoken', 'sessions')
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return ReplicaConstants.ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Направляет чтения внутри блока в реплику."""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Чтения - в реплику внутри use_replica(), записи - в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if (_use_replica.get()
+                and model._meta.app_label not in PRIMARY_APPS
+                and replica_configured()):
+            return ReplicaConstants.ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Без явного ответа Django записал бы объект, прочитанный
+        # из реплики, обратно в реплику.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит из основной базы вместе с данными.
+        return db != ReplicaConstants.ALIAS
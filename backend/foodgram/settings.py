@@ -4,7 +4,11 @@ from pathlib import Path
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
 
-from recipes.constants import SettingsConstants
+from profiler.constants import ProfilerConstants
+from recipes.constants import (CacheConstants, ImageConstants,
+                               MetricsConstants, ReplicaConstants,
+                               SettingsConstants)
+from users.constants import TokenCacheConstants
 
 load_dotenv()
 
@@ -32,9 +36,13 @@ INSTALLED_APPS = [
     'colorfield',
     'recipes.apps.RecipesConfig',
     'api.apps.ApiConfig',
+    'benchmarks.apps.BenchmarksConfig',
+    'profiler.apps.ProfilerConfig',
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'profiler.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -83,6 +92,27 @@ else:
         }
     }
 
+# Необязательная реплика для чтения: DB_REPLICA_HOST (и DB_REPLICA_PORT)
+# для PostgreSQL или DB_REPLICA_NAME - путь к файлу SQLite. Тестовая
+# реплика настраивается в foodgram.settings_test.
+if os.getenv('DB_REPLICA_HOST') and not DEBUG:
+    DATABASES[ReplicaConstants.ALIAS] = dict(
+        DATABASES['default'],
+        HOST=os.getenv('DB_REPLICA_HOST'),
+        PORT=os.getenv('DB_REPLICA_PORT', os.getenv('DB_PORT')),
+    )
+elif os.getenv('DB_REPLICA_NAME') and DEBUG:
+    DATABASES[ReplicaConstants.ALIAS] = dict(
+        DATABASES['default'], NAME=os.getenv('DB_REPLICA_NAME')
+    )
+if ReplicaConstants.ALIAS in DATABASES:
+    DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+# Сколько секунд после записи чтения клиента идут в основную базу.
+REPLICA_STICKY_SECONDS = int(
+    os.getenv('REPLICA_STICKY_SECONDS', ReplicaConstants.STICKY_SECONDS)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -108,18 +138,80 @@ USE_L10N = True
 
 USE_TZ = True
 
+# Общий кеш всех рабочих процессов - memcached (MEMCACHED_LOCATION,
+# например memcached:11211). Без него используется файловый кеш одного
+# хоста с вытеснением только при переполнении CacheConstants.MAX_ENTRIES.
+if os.getenv('MEMCACHED_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': os.getenv('MEMCACHED_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv(
+                'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+            ),
+            'OPTIONS': {'MAX_ENTRIES': CacheConstants.MAX_ENTRIES},
+        }
+    }
+# Фрагменты рецептов (api.fragments) хранятся отдельно от версий данных,
+# чтобы их вытеснение не затрагивало версии. Ключ фрагмента содержит
+# версии, поэтому кеш может быть локальным для процесса.
+CACHES['fragments'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'fragments',
+    'OPTIONS': {'MAX_ENTRIES': CacheConstants.FRAGMENTS_MAX_ENTRIES},
+}
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "collected_static"
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.getenv('IMAGE_UPLOAD_MAX_BYTES', ImageConstants.MAX_BYTES)
+)
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.getenv('IMAGE_UPLOAD_MAX_PIXELS', ImageConstants.MAX_PIXELS)
+)
+IMAGE_VARIANT_WORKERS = int(
+    os.getenv('IMAGE_VARIANT_WORKERS', ImageConstants.VARIANT_WORKERS)
+)
+
+# Доля запросов, для которых собираются метрики (0 - выключено).
+METRICS_SAMPLE_RATE = float(
+    os.getenv('METRICS_SAMPLE_RATE', MetricsConstants.SAMPLE_RATE)
+)
+# Заголовок Server-Timing для всех клиентов, а не только сотрудников.
+SERVER_TIMING_HEADER = (
+    os.getenv('SERVER_TIMING_HEADER', 'False').lower() == 'true'
+)
+
+# Профилирование запросов сотрудников по заголовку X-Profile.
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'True').lower() == 'true'
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILER_RING_SIZE = int(
+    os.getenv('PROFILER_RING_SIZE', ProfilerConstants.RING_SIZE)
+)
+PROFILER_MAX_BYTES = int(
+    os.getenv('PROFILER_MAX_BYTES', ProfilerConstants.MAX_BYTES)
+)
+
+# Кеш токенов аутентификации в памяти процесса.
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', TokenCacheConstants.SIZE))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', TokenCacheConstants.TTL))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
@@ -0,0 +1,18 @@
+"""
+Настройки тестов.
+
+Реплика - отдельная база SQLite без маршрутизатора: тесты реплики
+включают его сами, а миграции создают таблицы в обеих базах.
+Запуск: python manage.py test --settings=foodgram.settings_test
+"""
+import os
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import BASE_DIR, DATABASES
+from recipes.constants import ReplicaConstants
+
+DATABASES[ReplicaConstants.ALIAS] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': os.path.join(BASE_DIR, 'db_replica_sqlite3'),
+}
+DATABASE_ROUTERS = []
@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.urls import include, path
 
 urlpatterns = [
+    path('admin/profiles/', include('profiler.urls')),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 ]
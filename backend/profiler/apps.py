@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ProfilerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'profiler'
+    verbose_name = 'Профилировщик'
@@ -0,0 +1,172 @@
+"""
+Сбор профиля одного запроса.
+
+Запрос выполняется под cProfile, параллельно поток-сэмплер снимает
+стек обрабатывающего потока для flamegraph, а все SQL-запросы
+записываются вместе с местом вызова в коде проекта.
+"""
+import cProfile
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from profiler.constants import ProfilerConstants
+
+PROJECT_DIR = os.path.join(str(settings.BASE_DIR), '')
+PROFILER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '')
+
+
+def short_path(filename):
+    if filename.startswith(PROJECT_DIR):
+        return filename[len(PROJECT_DIR):]
+    marker = f'{os.sep}site-packages{os.sep}'
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    return filename
+
+
+def is_project_file(filename):
+    return (filename.startswith(PROJECT_DIR)
+            and f'{os.sep}site-packages{os.sep}' not in filename)
+
+
+class StackSampler:
+    """Периодически снимает стек потока в формате свернутых стеков."""
+
+    def __init__(self, thread_id,
+                 interval=ProfilerConstants.SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name='profiler-sampler', daemon=True
+        )
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(
+                    f'{code.co_name} ({short_path(code.co_filename)}:'
+                    f'{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def folded(self):
+        """Стеки в формате flamegraph.pl/speedscope: "a;b;c count"."""
+        return ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.items()
+        )
+
+
+class SQLRecorder:
+    """Обертка execute_wrapper, записывающая SQL-запросы."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'duration': time.perf_counter() - started,
+                'stack': self.origin(),
+            })
+
+    @staticmethod
+    def origin():
+        """Вызовы из кода проекта, приведшие к запросу."""
+        frames = [
+            f'{short_path(frame.filename)}:{frame.lineno} in {frame.name}'
+            for frame in traceback.extract_stack()
+            if is_project_file(frame.filename)
+            and not frame.filename.startswith(PROFILER_DIR)
+        ]
+        return frames[-ProfilerConstants.SQL_STACK_DEPTH:]
+
+    def summary(self):
+        """
+        Повторяющиеся запросы.
+
+        duplicates - запросы, выполненные несколько раз с теми же
+        параметрами, similar - с одинаковым текстом и разными
+        параметрами (признак N+1).
+        """
+        exact = Counter((query['sql'], query['params'])
+                        for query in self.queries)
+        shapes = defaultdict(list)
+        for query in self.queries:
+            shapes[query['sql']].append(query)
+        return {
+            'count': len(self.queries),
+            'duration': sum(query['duration'] for query in self.queries),
+            'duplicates': [
+                {'sql': sql, 'params': params, 'count': count}
+                for (sql, params), count in exact.most_common()
+                if count > 1
+            ],
+            'similar': [
+                {
+                    'sql': sql,
+                    'count': len(queries),
+                    'duration': sum(query['duration'] for query in queries),
+                    'stack': queries[0]['stack'],
+                }
+                for sql, queries in sorted(
+                    shapes.items(), key=lambda item: -len(item[1])
+                )
+                if len(queries) > 1
+            ],
+        }
+
+
+class RequestProfile:
+    """Профилирование запроса: with RequestProfile() as profile: ..."""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.sql = SQLRecorder()
+        self.stack = ExitStack()
+        self.created = timezone.now()
+        self.duration = None
+
+    def __enter__(self):
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self.sql))
+        self.sampler.start()
+        self.started = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.duration = time.perf_counter() - self.started
+        self.sampler.stop()
+        self.stack.close()
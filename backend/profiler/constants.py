@@ -0,0 +1,8 @@
+class ProfilerConstants:
+    HEADER = 'HTTP_X_PROFILE'
+    QUERY_PARAM = '_profile'
+    RING_SIZE = 50
+    MAX_BYTES = 200 * 1024 * 1024
+    SAMPLE_INTERVAL = 0.005
+    SQL_STACK_DEPTH = 6
+    TOP_FUNCTIONS = 60
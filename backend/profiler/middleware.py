@@ -0,0 +1,68 @@
+import logging
+
+from django.conf import settings
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.authentication import CachedTokenAuthentication
+from profiler.collector import RequestProfile
+from profiler.constants import ProfilerConstants
+from profiler.storage import save_profile
+
+logger = logging.getLogger(__name__)
+
+
+def staff_user(request):
+    """Сотрудник, отправивший запрос (по сессии или токену), или None."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = CachedTokenAuthentication().authenticate(request) or (
+                None, None
+            )
+        except AuthenticationFailed:
+            return None
+    if user is not None and user.is_active and user.is_staff:
+        return user
+    return None
+
+
+class ProfilerMiddleware:
+    """
+    Профилирование запросов по требованию сотрудника.
+
+    Запрос профилируется, если в нем есть заголовок X-Profile или
+    параметр _profile и его отправил сотрудник. Ссылка на сохраненный
+    профиль возвращается в заголовке X-Profile-Url.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILER_ENABLED or not (
+            ProfilerConstants.HEADER in request.META
+            or ProfilerConstants.QUERY_PARAM in request.GET
+        ):
+            return self.get_response(request)
+        user = staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        with RequestProfile() as profile:
+            response = self.get_response(request)
+        try:
+            profile_id = save_profile({
+                'method': request.method,
+                'path': request.get_full_path(),
+                'user': user.get_username(),
+                'status': response.status_code,
+                'duration': profile.duration,
+                'created': profile.created.isoformat(),
+            }, profile)
+        except OSError:
+            logger.exception('Не удалось сохранить профиль запроса')
+            return response
+        response['X-Profile-Url'] = request.build_absolute_uri(
+            reverse('profiler:detail', args=(profile_id,))
+        )
+        return response
@@ -0,0 +1,104 @@
+"""
+Кольцевое хранилище профилей на диске.
+
+Каждый профиль - каталог в PROFILER_DIR с метаданными, статистикой
+cProfile, свернутыми стеками и списком SQL-запросов. После записи
+нового профиля самые старые удаляются, пока их число и общий размер
+не уложатся в PROFILER_RING_SIZE и PROFILER_MAX_BYTES.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+META = 'meta.json'
+PSTATS = 'profile.pstats'
+FOLDED = 'stacks.folded'
+SQL = 'sql.json'
+FILES = {'pstats': PSTATS, 'folded': FOLDED, 'sql': SQL}
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+_lock = threading.Lock()
+
+
+def profile_path(profile_id, name=''):
+    if not PROFILE_ID.match(profile_id):
+        raise FileNotFoundError(profile_id)
+    return os.path.join(settings.PROFILER_DIR, profile_id, name)
+
+
+def save_profile(meta, request_profile):
+    """Сохраняет профиль запроса и возвращает его id."""
+    profile_id = (f'{timezone.now():%Y%m%d-%H%M%S}-'
+                  f'{uuid.uuid4().hex[:8]}')
+    directory = profile_path(profile_id)
+    os.makedirs(directory)
+    request_profile.profile.dump_stats(os.path.join(directory, PSTATS))
+    with open(os.path.join(directory, FOLDED), 'w',
+              encoding='utf-8') as file:
+        file.write(request_profile.sampler.folded())
+    with open(os.path.join(directory, SQL), 'w', encoding='utf-8') as file:
+        json.dump(request_profile.sql.queries, file, ensure_ascii=False)
+    with open(os.path.join(directory, META), 'w', encoding='utf-8') as file:
+        json.dump(
+            dict(meta, id=profile_id, sql=request_profile.sql.summary()),
+            file, ensure_ascii=False,
+        )
+    trim()
+    return profile_id
+
+
+def directory_size(directory):
+    return sum(
+        entry.stat().st_size for entry in os.scandir(directory)
+        if entry.is_file()
+    )
+
+
+def profile_ids():
+    """id профилей от новых к старым."""
+    try:
+        names = os.listdir(settings.PROFILER_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(
+        (name for name in names if PROFILE_ID.match(name)), reverse=True
+    )
+
+
+def trim():
+    with _lock:
+        ids = profile_ids()
+        sizes = [
+            directory_size(profile_path(profile_id)) for profile_id in ids
+        ]
+        total = sum(sizes)
+        while ids and (len(ids) > settings.PROFILER_RING_SIZE
+                       or total > settings.PROFILER_MAX_BYTES):
+            shutil.rmtree(profile_path(ids.pop()), ignore_errors=True)
+            total -= sizes.pop()
+
+
+def load_meta(profile_id):
+    with open(profile_path(profile_id, META), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_sql(profile_id):
+    with open(profile_path(profile_id, SQL), encoding='utf-8') as file:
+        return json.load(file)
+
+
+def list_profiles():
+    profiles = []
+    for profile_id in profile_ids():
+        try:
+            profiles.append(load_meta(profile_id))
+        except (OSError, ValueError):
+            continue
+    return profiles
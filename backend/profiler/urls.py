@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.urls import path
+
+from profiler import views
+
+app_name = 'profiler'
+
+urlpatterns = [
+    path('', admin.site.admin_view(views.profile_list), name='list'),
+    path(
+        '<str:profile_id>/',
+        admin.site.admin_view(views.profile_detail),
+        name='detail',
+    ),
+    path(
+        '<str:profile_id>/<str:kind>/',
+        admin.site.admin_view(views.profile_download),
+        name='download',
+    ),
+]
@@ -0,0 +1,55 @@
+import io
+import pstats
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+
+from profiler import storage
+from profiler.constants import ProfilerConstants
+
+
+def profile_list(request):
+    return TemplateResponse(request, 'profiler/profile_list.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'profiles': storage.list_profiles(),
+    })
+
+
+def pstats_report(profile_id):
+    stream = io.StringIO()
+    stats = pstats.Stats(
+        storage.profile_path(profile_id, storage.PSTATS), stream=stream
+    )
+    stats.strip_dirs().sort_stats('cumulative').print_stats(
+        ProfilerConstants.TOP_FUNCTIONS
+    )
+    return stream.getvalue()
+
+
+def profile_detail(request, profile_id):
+    try:
+        meta = storage.load_meta(profile_id)
+        queries = storage.load_sql(profile_id)
+        report = pstats_report(profile_id)
+    except (OSError, ValueError):
+        raise Http404('Профиль не найден.')
+    return TemplateResponse(request, 'profiler/profile_detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{meta["method"]} {meta["path"]}',
+        'meta': meta,
+        'queries': queries,
+        'report': report,
+    })
+
+
+def profile_download(request, profile_id, kind):
+    try:
+        name = storage.FILES[kind]
+        file = open(storage.profile_path(profile_id, name), 'rb')
+    except (KeyError, OSError):
+        raise Http404('Файл профиля не найден.')
+    return FileResponse(
+        file, as_attachment=True, filename=f'{profile_id}-{name}'
+    )
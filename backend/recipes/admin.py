@@ -2,6 +2,8 @@ from django.contrib import admin
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                      ShoppingCart, Tag)
+from .paginator import EstimatedCountPaginator
+from .search import refresh_search_index
 
 
 class IngredientInline(admin.TabularInline):
@@ -10,6 +12,7 @@ class IngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 3
     min_num = 1
+    autocomplete_fields = ('ingredients',)
 
 
 @admin.register(Recipe)
@@ -22,14 +25,23 @@ class RecipeAdmin(admin.ModelAdmin):
         'get_favorites',
         'get_ingredients',
     )
-    list_filter = ('author', 'name', 'tags',)
-    search_fields = ('name', 'author__username', 'tags')
+    list_filter = ('tags',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', 'tags')
     inlines = (IngredientInline,)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_queryset(self, request):
         queryset = super().get_queryset(request)
-        return queryset.select_related('author').prefetch_related('tags')
+        return queryset.select_related('author').prefetch_related(
+            'tags', 'ingredients'
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        refresh_search_index([form.instance.id])
 
     def get_ingredients(self, obj):
         return ', '.join([
@@ -39,9 +51,10 @@ class RecipeAdmin(admin.ModelAdmin):
     get_ingredients.short_description = 'Ингредиенты'
 
     def get_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     get_favorites.short_description = 'Избранное'
+    get_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(Ingredient)
@@ -52,7 +65,6 @@ class IngredientAdmin(admin.ModelAdmin):
         'name',
         'measurement_unit',
     )
-    list_filter = ('name',)
     search_fields = ('name',)
     empty_value_display = '-пусто-'
 
@@ -76,9 +88,12 @@ class FavoriteAdmin(admin.ModelAdmin):
     """Административный класс для управления списка избранных рецептов."""
 
     list_display = ('user', 'recipe',)
-    list_filter = ('user', 'recipe',)
-    search_fields = ('user__username', 'recipe__title',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(ShoppingCart)
@@ -86,6 +101,9 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     """Административный класс для управления корзиной покупок."""
 
     list_display = ('user', 'recipe',)
-    list_filter = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name',)
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
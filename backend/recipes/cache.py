@@ -0,0 +1,107 @@
+"""Версии данных и кеши в памяти процесса."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def version_key(scope):
+    return f'version:{scope}'
+
+
+def get_version(scope):
+    """
+    Возвращает текущую версию данных scope.
+
+    Версия - время последнего изменения (timestamp), хранится в общем
+    кеше, поэтому видна всем процессам приложения.
+    """
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        # Ключ могли добавить параллельно или уже вытеснить из кеша:
+        # тогда действует новая версия, что лишь сбрасывает кеши scope.
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def peek_version(scope):
+    """Возвращает версию данных scope или None, не создавая ее."""
+    return cache.get(version_key(scope))
+
+
+def get_versions(scopes):
+    """Возвращает версии нескольких scope одним обращением к кешу."""
+    keys = {version_key(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        now = time.time()
+        existing = [key for key in missing if not cache.add(key, now, None)]
+        if existing:
+            versions.update(cache.get_many(existing))
+        # Как и в get_version, вытесненный ключ получает новую версию.
+        for key in missing:
+            versions.setdefault(key, now)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_version(scope):
+    """Отмечает изменение данных scope."""
+    cache.set(version_key(scope), time.time(), None)
+
+
+def bump_version_on_commit(scope):
+    """Отмечает изменение данных scope после фиксации транзакции."""
+    transaction.on_commit(partial(bump_version, scope))
+
+
+def recipe_scope(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def user_scope(user_id):
+    return f'user:{user_id}'
+
+
+def token_scope(key):
+    # Сам токен в ключах общего кеша не хранится.
+    return f'token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кеш ограниченного размера."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
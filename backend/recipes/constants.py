@@ -6,6 +6,8 @@ class IngredientConstants:
 class TagConstants:
     COLOR_LENGTH_MAX = 7
     NAME_LENGTH_MAX = 200
+    BITS_MAX = 63
+    MASK_VALUES_MAX = 256
 
 
 class RecipeConstants:
@@ -14,7 +16,67 @@ class RecipeConstants:
     NAME_LENGTH_MAX = 200
     COOK_TIME_MIN = 1
     COOK_TIME_MAX = 24 * 60
+    BULK_BATCH_SIZE = 500
+
+
+class ShoppingListConstants:
+    CHUNK_SIZE = 500
+
+
+class FeedConstants:
+    ENTRIES_MAX = 1000
+    BATCH_SIZE = 1000
+
+
+class SearchConstants:
+    CONFIG = 'russian'
+    CHUNK_SIZE = 500
+    FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+
+class CacheConstants:
+    MAX_ENTRIES = 100000
+    FRAGMENTS_MAX_ENTRIES = 10000
 
 
 class SettingsConstants:
     PAGE_SIZE = 6
+
+
+class ImageConstants:
+    MAX_BYTES = 10 * 1024 * 1024
+    MAX_PIXELS = 40 * 1000 * 1000
+    FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+    DECODE_CHUNK_SIZE = 64 * 1024
+    SPOOL_SIZE = 1024 * 1024
+    THUMBNAIL_SIZE = (320, 320)
+    DETAIL_SIZE = (1024, 1024)
+    VARIANT_WORKERS = 2
+
+
+class AdminConstants:
+    EXACT_COUNT_MAX = 10000
+
+
+class SeedConstants:
+    BATCH_SIZE = 5000
+    PUBLISHED_DAYS = 365
+    INGREDIENTS_MIN = 3
+    INGREDIENTS_MAX = 10
+    TAGS_MAX = 3
+    POPULARITY_EXPONENT = 1.0
+    ACTIVITY_EXPONENT = 0.5
+
+
+class MetricsConstants:
+    SAMPLE_RATE = 0.1
+    PREFIX = 'foodgram'
+    DURATION_BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    )
+    QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class ReplicaConstants:
+    ALIAS = 'replica'
+    STICKY_SECONDS = 10
@@ -0,0 +1,133 @@
+"""
+Уменьшенные копии картинок рецептов.
+
+Копии строятся в фоновом пуле потоков после фиксации транзакции и
+сохраняются под именами, однозначно вычисляемыми из имени исходной
+картинки. После построения копий версия рецепта увеличивается, чтобы
+закешированные представления получили ссылки на них.
+"""
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, features
+
+from recipes.cache import bump_version, recipe_scope
+from recipes.constants import ImageConstants
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL, DETAIL, WEBP = 'thumbnail', 'detail', 'webp'
+VARIANTS = (THUMBNAIL, DETAIL, WEBP)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def available_variants():
+    if features.check('webp'):
+        return VARIANTS
+    return (THUMBNAIL, DETAIL)
+
+
+def variant_name(name, variant):
+    """Имя файла копии картинки name."""
+    root, extension = posixpath.splitext(name)
+    directory, base = posixpath.split(root)
+    if variant == WEBP:
+        extension = '.webp'
+    return posixpath.join(
+        directory, 'variants', f'{base}_{variant}{extension}'
+    )
+
+
+def variant_urls(name):
+    """Ссылки на уже построенные копии картинки."""
+    urls = dict.fromkeys(VARIANTS)
+    if not name:
+        return urls
+    for variant in available_variants():
+        path = variant_name(name, variant)
+        if default_storage.exists(path):
+            urls[variant] = default_storage.url(path)
+    return urls
+
+
+def _prepare(image, variant):
+    if variant == WEBP:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        return image, 'WEBP'
+    return image, image.format
+
+
+def _save(image, name, image_format):
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(recipe_id, name):
+    """Строит недостающие копии картинки рецепта."""
+    missing = [
+        variant for variant in available_variants()
+        if not default_storage.exists(variant_name(name, variant))
+    ]
+    if not missing:
+        return
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image_format = image.format
+        image.draft('RGB', ImageConstants.DETAIL_SIZE)
+        detail = image.copy()
+        detail.thumbnail(ImageConstants.DETAIL_SIZE)
+        detail.format = image_format
+    sizes = {DETAIL: detail, WEBP: detail}
+    if THUMBNAIL in missing:
+        thumbnail = detail.copy()
+        thumbnail.thumbnail(ImageConstants.THUMBNAIL_SIZE)
+        thumbnail.format = image_format
+        sizes[THUMBNAIL] = thumbnail
+    for variant in missing:
+        variant_image, variant_format = _prepare(sizes[variant], variant)
+        _save(variant_image, variant_name(name, variant), variant_format)
+    bump_version(recipe_scope(recipe_id))
+
+
+def _run(recipe_id, name):
+    try:
+        build_variants(recipe_id, name)
+    except Exception:
+        logger.exception('Не удалось построить копии картинки %s', name)
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+
+
+def _submit(recipe_id, name):
+    global _executor
+    with _executor_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='image-variants',
+            )
+    _executor.submit(_run, recipe_id, name)
+
+
+def schedule_variants(recipe):
+    """Ставит построение копий картинки рецепта в очередь после коммита."""
+    if recipe.image:
+        name = recipe.image.name
+        transaction.on_commit(lambda: _submit(recipe.pk, name))
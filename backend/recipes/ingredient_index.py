@@ -0,0 +1,97 @@
+"""Индекс названий ингредиентов в памяти процесса."""
+import re
+import threading
+from bisect import bisect_left, bisect_right
+
+from recipes.cache import get_version
+from recipes.models import Ingredient
+
+SPACES = re.compile(r'\s+')
+
+EXACT, PREFIX, SUBSTRING = range(3)
+
+
+def normalize(text):
+    """Приводит название к виду для поиска: регистр, ё/е и пробелы."""
+    return SPACES.sub(' ', text.casefold().replace('ё', 'е')).strip()
+
+
+class IngredientIndex:
+    """
+    Отсортированный индекс нормализованных названий ингредиентов.
+
+    Строится при первом обращении и перестраивается, когда меняется
+    общая для всех процессов версия справочника ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+
+    def _get_fresh_data(self, version):
+        if version == self._version:
+            return self._data
+        return None
+
+    def _build(self):
+        rows = sorted(
+            (
+                (normalize(row['name']), row['id'], row)
+                for row in Ingredient.objects.values(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            ),
+            key=lambda item: item[:2],
+        )
+        keys = [key for key, _, _ in rows]
+        entries = [row for _, _, row in rows]
+        starts, offset = [], 0
+        for key in keys:
+            starts.append(offset)
+            offset += len(key) + 1
+        self._data = (keys, entries, '\n'.join(keys), starts)
+        return self._data
+
+    def _snapshot(self):
+        version = get_version('ingredients')
+        data = self._get_fresh_data(version)
+        if data is None:
+            with self._lock:
+                data = self._get_fresh_data(version)
+                if data is None:
+                    data = self._build()
+                    self._version = version
+        return data
+
+    def search(self, query):
+        """
+        Возвращает ингредиенты, название которых содержит query.
+
+        Сначала идут точные совпадения, затем совпадения по началу
+        названия, затем по подстроке.
+        """
+        keys, entries, text, starts = self._snapshot()
+        query = normalize(query)
+        if not query:
+            return list(entries)
+        matches = []
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            rank = EXACT if keys[end] == query else PREFIX
+            matches.append((rank, 0, end))
+            end += 1
+        position = text.find(query)
+        while position != -1:
+            index = bisect_right(starts, position) - 1
+            if not start <= index < end:
+                matches.append((SUBSTRING, position - starts[index], index))
+            if index + 1 == len(starts):
+                break
+            position = text.find(query, starts[index + 1])
+        matches.sort()
+        return [entries[index] for _, _, index in matches]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = 'Сравнение поиска ингредиентов через ORM и через индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=1000,
+            help='Количество поисковых запросов',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError('Нет ингредиентов, загрузите справочник.')
+        generator = random.Random(options['seed'])
+        queries = [
+            name[:generator.randint(1, min(len(name), 4))]
+            for name in generator.choices(names, k=options['queries'])
+        ]
+
+        orm_time = self.measure(lambda query: list(
+            Ingredient.objects.filter(name__istartswith=query).values(
+                'id', 'name', 'measurement_unit'
+            )
+        ), queries)
+
+        index = IngredientIndex()
+        started = time.perf_counter()
+        index.search('')
+        build_time = time.perf_counter() - started
+        index_time = self.measure(index.search, queries)
+
+        self.stdout.write(
+            f'Ингредиентов: {len(names)}, запросов: {len(queries)}\n'
+            f'ORM (istartswith): {orm_time * 1000:.3f} мс на запрос\n'
+            f'Индекс: {index_time * 1000:.3f} мс на запрос '
+            f'(построение {build_time * 1000:.1f} мс)'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: x{orm_time / index_time:.1f}'
+        ))
+
+    def measure(self, search, queries):
+        started = time.perf_counter()
+        for query in queries:
+            search(query)
+        return (time.perf_counter() - started) / len(queries)
@@ -0,0 +1,113 @@
+import random
+import time
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.constants import SettingsConstants
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Rollback(Exception):
+    """Отмена транзакции с тестовыми рецептами."""
+
+
+class Command(BaseCommand):
+    help = 'Сравнение фильтрации рецептов по тегам через JOIN и по маске'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=0,
+            help='Количество временных рецептов для заполнения базы '
+                 '(удаляются после замера)',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Количество повторов каждого запроса',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+
+    def handle(self, *args, **options):
+        tags = list(Tag.objects.all())
+        if not tags:
+            raise CommandError('Нет тегов, выполните create_tags.')
+        try:
+            with transaction.atomic():
+                if options['recipes']:
+                    self.seed(tags, options['recipes'], options['seed'])
+                self.benchmark(tags, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, tags, count, seed):
+        generator = random.Random(seed)
+        author = User.objects.create(
+            username='benchmark_tag_filter',
+            email='benchmark_tag_filter@example.com',
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author=author,
+                    name=f'Рецепт {number}',
+                    text='Описание',
+                    cooking_time=generator.randint(1, 120),
+                    image='recipes/images/benchmark.png',
+                )
+                for number in range(count)
+            ),
+            batch_size=1000,
+        )
+        recipe_ids = author.recipes.values_list('id', flat=True)
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+                for recipe_id in recipe_ids.iterator()
+                for tag in generator.sample(
+                    tags, generator.randint(1, len(tags))
+                )
+            ),
+            batch_size=1000,
+        )
+        author.recipes.all().refresh_tags_mask()
+
+    def benchmark(self, tags, repeat):
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, тегов: {len(tags)}'
+        )
+        join_total = mask_total = 0
+        for size in range(1, min(len(tags), 3) + 1):
+            for selected in combinations(tags, size):
+                slugs = [tag.slug for tag in selected]
+                join_time = self.measure(
+                    Recipe.objects.filter(tags__slug__in=slugs).distinct(),
+                    repeat,
+                )
+                mask_time = self.measure(
+                    Recipe.objects.with_any_tags(selected), repeat
+                )
+                join_total += join_time
+                mask_total += mask_time
+                self.stdout.write(
+                    f'{",".join(slugs)}: JOIN {join_time * 1000:.2f} мс, '
+                    f'маска {mask_time * 1000:.2f} мс'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: x{join_total / mask_total:.1f}'
+        ))
+
+    def measure(self, queryset, repeat):
+        """Среднее время подсчета и получения первой страницы списка."""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            queryset.count()
+            list(queryset.values_list('id', flat=True)[
+                :SettingsConstants.PAGE_SIZE
+            ])
+        return (time.perf_counter() - started) / repeat
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from recipes.cache import bump_version
 from recipes.models import Tag
 
 
@@ -12,5 +13,9 @@ class Command(BaseCommand):
             {'name': 'Обед', 'color': '#66BB6A', 'slug': 'lunch'},
             {'name': 'Ужин', 'color': '#5E35B1', 'slug': 'dinner'}
         )
-        Tag.objects.bulk_create(Tag(**tag) for tag in tag_data)
+        Tag.objects.bulk_create(
+            Tag(bit=bit, **tag)
+            for bit, tag in zip(Tag.objects.free_bits(), tag_data)
+        )
+        bump_version('tags')
         self.stdout.write(self.style.SUCCESS('Теги созданы!'))
@@ -1,23 +1,188 @@
 import csv
+import io
+import json
+import os
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.cache import bump_version
 from recipes.models import Ingredient
 
+JSON_SEPARATORS = ' \t\r\n,'
+
+
+def iter_csv(file):
+    yield from csv.DictReader(file)
+
+
+def iter_json(file, chunk_size=64 * 1024):
+    """Построчно разбирает JSON-массив объектов, не загружая его целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(chunk_size)
+        buffer += chunk
+        position = 0
+        while True:
+            while (position < len(buffer)
+                   and buffer[position] in JSON_SEPARATORS):
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != '[':
+                    raise CommandError('Ожидается JSON-массив объектов.')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Некорректный JSON.')
+                break
+            yield item
+        buffer = buffer[position:]
+        if not chunk:
+            return
+
+
+READERS = {'csv': iter_csv, 'json': iter_json}
+
+
+def clean_rows(rows):
+    for row in rows:
+        name = (row.get('name') or '').strip()
+        measurement_unit = (row.get('measurement_unit') or '').strip()
+        if name and measurement_unit:
+            yield name, measurement_unit
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Command(BaseCommand):
     help = 'Загрузка ингредиентов'
 
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(
-            f'{data_path}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as file:
-            reader = csv.DictReader(file)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу CSV или JSON с ингредиентами',
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла (по умолчанию - по расширению)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество строк в одной пачке',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY на PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (
+            options['format'] or os.path.splitext(path)[1].lstrip('.')
+        ).lower()
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат файла: {file_format or path}'
+            )
+        use_copy = (connection.vendor == 'postgresql'
+                    and not options['no_copy'])
+        self.verbosity = options['verbosity']
+        count_before = Ingredient.objects.count()
+        self.started = time.monotonic()
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                rows = clean_rows(READERS[file_format](file))
+                with transaction.atomic():
+                    if use_copy:
+                        processed = self.copy(rows, options['batch_size'])
+                    else:
+                        processed = self.bulk_insert(
+                            rows, options['batch_size']
+                        )
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        bump_version('ingredients')
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'Ингредиенты импортированы! Обработано строк: {processed}, '
+            f'добавлено новых: {created}, {self.rate(processed)}'
+        ))
+
+    def rate(self, processed):
+        elapsed = time.monotonic() - self.started
+        return (f'{elapsed:.1f} с, '
+                f'{processed / elapsed if elapsed else 0:.0f} строк/с')
+
+    def report(self, processed):
+        if self.verbosity > 0:
+            self.stdout.write(
+                f'Обработано {processed}, {self.rate(processed)}'
+            )
+
+    def bulk_insert(self, rows, batch_size):
+        processed = 0
+        for batch in batches(rows, batch_size):
             Ingredient.objects.bulk_create(
-                Ingredient(**ingredient_data) for ingredient_data in reader
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                ignore_conflicts=True,
+            )
+            processed += len(batch)
+            self.report(processed)
+        return processed
+
+    def copy(self, rows, batch_size):
+        """Загрузка через COPY во временную таблицу и INSERT ... SELECT."""
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        processed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            for batch in batches(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                processed += len(batch)
+                self.report(processed)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
             )
-        self.stdout.write(self.style.SUCCESS('Ингредиенты импортированы!'))
+        return processed
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from recipes.search import refresh_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перестройка поискового индекса рецептов'
+
+    def handle(self, *args, **options):
+        refresh_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен!'))
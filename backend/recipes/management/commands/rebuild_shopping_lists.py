@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересчет агрегированных списков покупок по корзинам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить списки покупок с корзинами',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при вставке строк',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.rebuild(options['batch_size'])
+
+    def rebuild(self, batch_size):
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=row['user_id'],
+                        ingredient_id=row['ingredient_id'],
+                        amount=row['total'],
+                    )
+                    for row in ShoppingListItem.objects.expected_amounts(
+                    ).iterator()
+                ),
+                batch_size=batch_size,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок пересчитаны: '
+            f'{ShoppingListItem.objects.count()} строк.'
+        ))
+
+    def verify(self):
+        expected = {
+            (row['user_id'], row['ingredient_id']): row['total']
+            for row in ShoppingListItem.objects.expected_amounts().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        mismatches = [
+            (key, expected.get(key, 0), actual.get(key, 0))
+            for key in expected.keys() | actual.keys()
+            if expected.get(key, 0) != actual.get(key, 0)
+        ]
+        for (user_id, ingredient_id), expected_amount, amount in sorted(
+            mismatches
+        ):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'ожидается {expected_amount}, сохранено {amount}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify для пересчета.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Списки покупок совпадают с корзинами.'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Сверка счетчиков избранного рецептов с таблицей избранного'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить счетчики, не исправляя их',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = list(
+            Recipe.objects.with_actual_favorites_count().exclude(
+                favorites_count=F('actual_favorites_count')
+            ).values_list('id', 'favorites_count', 'actual_favorites_count')
+        )
+        for recipe_id, stored, actual in mismatches:
+            self.stdout.write(
+                f'Рецепт {recipe_id}: сохранено {stored}, '
+                f'фактически {actual}'
+            )
+        if mismatches and options['verify']:
+            raise CommandError(
+                f'Найдено расхождений: {len(mismatches)}. '
+                'Запустите команду без --verify для исправления.'
+            )
+        Recipe.objects.filter(
+            id__in=[recipe_id for recipe_id, _, _ in mismatches]
+        ).refresh_favorites_count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчики избранного сверены, исправлено: {len(mismatches)}.'
+        ))
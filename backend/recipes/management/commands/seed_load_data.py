@@ -0,0 +1,72 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.constants import SeedConstants
+from recipes.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Заполнение базы синтетическими данными для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        for name, default, text in (
+            ('users', 1000, 'пользователей'),
+            ('recipes', 10000, 'рецептов'),
+            ('favorites', 100000, 'добавлений в избранное'),
+            ('carts', 5000, 'добавлений в корзину'),
+            ('subscriptions', 10000, 'подписок'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default,
+                help=f'Количество {text}',
+            )
+        parser.add_argument(
+            '--feed-users', type=int, default=100,
+            help='Количество пользователей, для которых заполняются ленты '
+                 'подписок',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=SeedConstants.BATCH_SIZE,
+            help='Количество строк в одной пачке',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов для генерации строк '
+                 '(0 - по числу процессоров)',
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 and options['subscriptions']:
+            raise CommandError('Для подписок нужно хотя бы 2 пользователя.')
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            workers=options['workers'] or os.cpu_count(),
+            use_copy=not options['no_copy'],
+            stdout=self.stdout if options['verbosity'] > 0 else None,
+        )
+        started = time.monotonic()
+        try:
+            seeder.run(
+                users=options['users'],
+                recipes=options['recipes'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                subscriptions=options['subscriptions'],
+                feed_users=options['feed_users'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {time.monotonic() - started:.1f} с.'
+        ))
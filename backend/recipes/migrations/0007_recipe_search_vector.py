@@ -0,0 +1,73 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:16
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Копия recipes.search на момент миграции: миграция не должна зависеть
+# от последующих изменений кода.
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_REFRESH = """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS recipe_ingredient
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = recipe_ingredient.ingredients_id
+            WHERE recipe_ingredient.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+SQLITE_REFRESH = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredients_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+        schema_editor.execute(POSTGRESQL_REFRESH)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            "name, ingredients, text, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(SQLITE_REFRESH)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
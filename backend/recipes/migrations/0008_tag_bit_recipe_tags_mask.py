@@ -0,0 +1,46 @@
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_tags_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for bit, tag in enumerate(Tag.objects.order_by('id')):
+        tag.bit = bit
+        tag.save(update_fields=('bit',))
+    masks = defaultdict(int)
+    relations = Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag__bit'
+    )
+    for recipe_id, bit in relations.iterator():
+        masks[recipe_id] |= 1 << bit
+    recipes_by_mask = defaultdict(list)
+    for recipe_id, mask in masks.items():
+        recipes_by_mask[mask].append(recipe_id)
+    for mask, recipe_ids in recipes_by_mask.items():
+        for start in range(0, len(recipe_ids), 500):
+            Recipe.objects.filter(
+                id__in=recipe_ids[start:start + 500]
+            ).update(tags_mask=mask)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, unique=True, verbose_name='Бит в маске тегов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FEED_ENTRIES_MAX = 1000
+
+
+def fill_feeds(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedEntry = apps.get_model('recipes', 'FeedEntry')
+    Subscription = apps.get_model('users', 'Subscription')
+    user_ids = Subscription.objects.values_list(
+        'user_id', flat=True
+    ).distinct().order_by('user_id')
+    for user_id in user_ids.iterator():
+        recipes = Recipe.objects.filter(
+            author__following__user_id=user_id
+        ).order_by('-pub_date', '-id').values_list('id', 'pub_date')
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                          pub_date=pub_date)
+                for recipe_id, pub_date in recipes[:FEED_ENTRIES_MAX]
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_alter_tag_bit'),
+        ('users', '0003_user_manager'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'записи ленты',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_entry'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
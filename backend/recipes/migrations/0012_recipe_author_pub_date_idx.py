@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:23
+
+from django.db import migrations, models
+
+
+def create_name_prefix_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX ingredient_name_upper_prefix_idx '
+            'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE INDEX ingredient_name_upper_prefix_idx '
+            'ON recipes_ingredient (name COLLATE NOCASE)'
+        )
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('postgresql', 'sqlite'):
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS ingredient_name_upper_prefix_idx'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(create_name_prefix_index, drop_name_prefix_index),
+    ]
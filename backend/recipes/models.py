@@ -1,12 +1,17 @@
+from collections import defaultdict
+
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connection, models, transaction
+from django.db.models import F, UniqueConstraint
+from django.db.models.functions import Coalesce, Greatest, RowNumber
 
 from recipes.constants import (
-    IngredientConstants, RecipeConstants, TagConstants
+    FeedConstants, IngredientConstants, RecipeConstants, TagConstants
 )
-from users.models import User
+from users.models import Subscription, User
 
 
 class ShoppingFavorite(models.Model):
@@ -28,6 +33,162 @@ class ShoppingFavorite(models.Model):
         ordering = ['user', 'recipe']
 
 
+def recipe_prefetches():
+    """Связанные данные, необходимые для вывода рецепта."""
+    return (
+        'tags',
+        models.Prefetch(
+            'recipe_ingredients',
+            queryset=RecipeIngredient.objects.select_related('ingredients'),
+        ),
+    )
+
+
+def tags_mask(bits):
+    """Маска тегов по их битам."""
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return mask
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Набор запросов рецептов."""
+
+    def with_any_tags(self, tags):
+        """
+        Рецепты хотя бы с одним из тегов tags по маске тегов.
+
+        Пока тегов немного, условие записывается как tags_mask IN (...)
+        по всем подходящим значениям маски, что позволяет использовать
+        индекс. Иначе используется побитовое И.
+        """
+        selected = tags_mask(tag.bit for tag in tags)
+        bits = sorted(Tag.objects.values_list('bit', flat=True))
+        if 2 ** len(bits) > TagConstants.MASK_VALUES_MAX:
+            return self.alias(
+                tags_match=F('tags_mask').bitand(selected)
+            ).exclude(tags_match=0)
+        masks = []
+        for combination in range(1, 2 ** len(bits)):
+            mask = tags_mask(
+                bit for index, bit in enumerate(bits)
+                if combination >> index & 1
+            )
+            if mask & selected:
+                masks.append(mask)
+        return self.filter(tags_mask__in=masks)
+
+    def change_favorites_count(self, delta):
+        """Атомарно изменяет счетчик избранного рецептов набора."""
+        return self.update(favorites_count=Greatest(
+            F('favorites_count') + delta, 0
+        ))
+
+    def with_actual_favorites_count(self):
+        """Аннотирует фактическое количество добавлений в избранное."""
+        return self.annotate(
+            actual_favorites_count=self.actual_favorites_count()
+        )
+
+    def refresh_favorites_count(self):
+        """Записывает в счетчики фактическое количество добавлений."""
+        return self.update(favorites_count=self.actual_favorites_count())
+
+    @staticmethod
+    def actual_favorites_count():
+        return Coalesce(
+            models.Subquery(
+                Favorite.objects.filter(
+                    recipe=models.OuterRef('pk')
+                ).order_by().values('recipe').annotate(
+                    total=models.Count('id')
+                ).values('total')
+            ),
+            0,
+        )
+
+    def refresh_tags_mask(self):
+        """Пересчитывает маски тегов рецептов набора."""
+        masks = dict.fromkeys(self.values_list('id', flat=True), 0)
+        if not masks:
+            return
+        relations = Recipe.tags.through.objects.filter(
+            recipe_id__in=list(masks)
+        ).values_list('recipe_id', 'tag__bit')
+        for recipe_id, bit in relations:
+            masks[recipe_id] |= 1 << bit
+        recipes_by_mask = defaultdict(list)
+        for recipe_id, mask in masks.items():
+            recipes_by_mask[mask].append(recipe_id)
+        for mask, recipe_ids in recipes_by_mask.items():
+            Recipe.objects.filter(id__in=recipe_ids).update(tags_mask=mask)
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты рецептов."""
+        return self.select_related('author').prefetch_related(
+            *recipe_prefetches()
+        )
+
+    def latest_by_author(self, author_ids, limit=None):
+        """
+        Возвращает последние рецепты авторов одним запросом.
+
+        При заданном limit для каждого автора отбирается не более limit
+        рецептов с помощью оконной функции ROW_NUMBER().
+        """
+        queryset = self.filter(author_id__in=author_ids).order_by(
+            '-pub_date', '-id'
+        )
+        if limit is None:
+            return list(queryset)
+        ranked = queryset.annotate(recipe_rank=models.Window(
+            expression=RowNumber(),
+            partition_by=models.F('author_id'),
+            order_by=(models.F('pub_date').desc(), models.F('id').desc()),
+        ))
+        sql, params = ranked.query.sql_with_params()
+        return list(self.raw(
+            f'SELECT * FROM ({sql}) ranked_recipes '
+            'WHERE recipe_rank <= %s ORDER BY pub_date DESC, id DESC',
+            (*params, limit),
+        ))
+
+    def with_user_flags(self, user):
+        """
+        Аннотирует признаки избранного, корзины и подписки на автора
+        для пользователя.
+        """
+        if not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                is_author_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_author_subscribed=models.Exists(Subscription.objects.filter(
+                user=user, following=models.OuterRef('author_id')
+            )),
+        )
+
+
+class TagQuerySet(models.QuerySet):
+    """Набор запросов тегов."""
+
+    def free_bits(self):
+        """Свободные биты маски тегов по возрастанию."""
+        used = set(self.values_list('bit', flat=True))
+        return [bit for bit in range(TagConstants.BITS_MAX)
+                if bit not in used]
+
+
 class Tag(models.Model):
     """Модель тегов."""
 
@@ -45,12 +206,29 @@ class Tag(models.Model):
         verbose_name='Слаг',
         unique=True,
     )
+    bit = models.PositiveSmallIntegerField(
+        verbose_name='Бит в маске тегов',
+        unique=True,
+        editable=False,
+    )
+
+    objects = TagQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Тег'
         verbose_name_plural = 'теги'
         ordering = ['name']
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            free_bits = Tag.objects.free_bits()
+            if not free_bits:
+                raise ValidationError(
+                    f'Тегов не может быть больше {TagConstants.BITS_MAX}!'
+                )
+            self.bit = free_bits[0]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.name} (цвет: {self.color})'
 
@@ -129,11 +307,43 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        verbose_name='Маска тегов',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'рецепты'
         ordering = ['-pub_date']
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-pub_date', '-id'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -213,3 +423,233 @@ class RecipeIngredient(models.Model):
             f'{self.ingredients.name} '
             f'({self.ingredients.measurement_unit}) - {self.amount}'
         )
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    """Набор запросов агрегированного списка покупок."""
+
+    def apply_amounts(self, user_ids, amounts):
+        """
+        Прибавляет количества ингредиентов к спискам пользователей.
+
+        amounts - словарь {id ингредиента: изменение количества},
+        отрицательные значения вычитаются. Строки с нулевым
+        количеством удаляются.
+        """
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        if not amounts:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        with transaction.atomic():
+            self.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id, ingredient_id=ingredient_id
+                    )
+                    for user_id in user_ids
+                    for ingredient_id, amount in amounts.items()
+                    if amount > 0
+                ),
+                ignore_conflicts=True,
+            )
+            for ingredient_id, amount in amounts.items():
+                self.filter(
+                    user_id__in=user_ids, ingredient_id=ingredient_id
+                ).update(amount=Greatest(
+                    models.F('amount') + amount, models.Value(0)
+                ))
+            self.filter(user_id__in=user_ids, amount=0).delete()
+
+    def add_recipe(self, user, recipe_id, sign=1):
+        """Добавляет ингредиенты рецепта в список покупок."""
+        amounts = RecipeIngredient.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredients_id', 'amount')
+        self.apply_amounts(
+            (user.id,),
+            {ingredient_id: sign * amount
+             for ingredient_id, amount in amounts},
+        )
+
+    def remove_recipe(self, user, recipe_id):
+        """Вычитает ингредиенты рецепта из списка покупок."""
+        self.add_recipe(user, recipe_id, sign=-1)
+
+    def change_recipe(self, recipe, amounts):
+        """Применяет изменения состава рецепта ко всем корзинам с ним."""
+        self.apply_amounts(
+            recipe.shopping_cart.values_list('user_id', flat=True), amounts
+        )
+
+    def remove_recipe_from_carts(self, recipe):
+        """Вычитает рецепт из списков всех пользователей."""
+        self.change_recipe(recipe, {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe.recipe_ingredients.values_list(
+                'ingredients_id', 'amount'
+            )
+        })
+
+    def expected_amounts(self):
+        """Агрегат списков покупок, рассчитанный по корзинам."""
+        return RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            user_id=models.F('recipe__shopping_cart__user'),
+            ingredient_id=models.F('ingredients'),
+        ).annotate(total=models.Sum('amount')).order_by()
+
+
+class ShoppingListItem(models.Model):
+    """Модель агрегированного списка покупок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+        default=0,
+    )
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'список покупок'
+        ordering = ['user', 'ingredient']
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'ingredient'),
+                                    name='unique_shopping_list_item'),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.amount}'
+
+
+class FeedQuerySet(models.QuerySet):
+    """Набор запросов лент подписок."""
+
+    def fan_out(self, recipes):
+        """Добавляет новые рецепты в ленты подписчиков их авторов."""
+        recipes_by_author = defaultdict(list)
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author_id, author_recipes in recipes_by_author.items():
+            follower_ids = Subscription.objects.filter(
+                following_id=author_id
+            ).values_list('user_id', flat=True).order_by('user_id')
+            batch = []
+            for follower_id in follower_ids.iterator(
+                chunk_size=FeedConstants.BATCH_SIZE
+            ):
+                batch.append(follower_id)
+                if len(batch) == FeedConstants.BATCH_SIZE:
+                    self.add_entries(batch, author_recipes)
+                    batch = []
+            if batch:
+                self.add_entries(batch, author_recipes)
+
+    def add_entries(self, user_ids, recipes):
+        """Добавляет рецепты в ленты пользователей и обрезает ленты."""
+        self.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe.id,
+                    pub_date=recipe.pub_date,
+                )
+                for user_id in user_ids
+                for recipe in recipes
+            ),
+            ignore_conflicts=True,
+        )
+        self.trim(user_ids)
+
+    def backfill(self, user, author):
+        """Добавляет в ленту последние рецепты автора после подписки."""
+        self.add_entries([user.id], Recipe.objects.filter(
+            author=author
+        ).order_by('-pub_date', '-id')[:FeedConstants.ENTRIES_MAX])
+
+    def prune(self, user, author):
+        """Удаляет рецепты автора из ленты после отписки."""
+        self.filter(user=user, recipe__author=author).delete()
+
+    def trim(self, user_ids):
+        """Оставляет в лентах пользователей не больше ENTRIES_MAX записей."""
+        ranked = self.filter(user_id__in=user_ids).annotate(
+            position=models.Window(
+                expression=RowNumber(),
+                partition_by=F('user_id'),
+                order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+            )
+        ).values('id', 'position')
+        sql, params = ranked.query.sql_with_params()
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM ({sql}) ranked_entries '
+                'WHERE position > %s)',
+                (*params, FeedConstants.ENTRIES_MAX),
+            )
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок.
+
+    Лента хранится отдельно для каждого пользователя и пополняется при
+    публикации рецепта (fan-out on write). Дата публикации копируется
+    из рецепта, чтобы лента читалась по индексу без соединения таблиц.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    objects = FeedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'Рецепт "{self.recipe}" в ленте {self.user}'
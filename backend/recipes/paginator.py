@@ -0,0 +1,37 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from recipes.constants import AdminConstants
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки с приблизительным количеством строк.
+
+    Для запросов без условий на PostgreSQL количество берется из
+    статистики планировщика (pg_class.reltuples), если таблица больше
+    AdminConstants.EXACT_COUNT_MAX строк. Иначе выполняется COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = self.estimate(self.object_list)
+            if estimate > AdminConstants.EXACT_COUNT_MAX:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                (queryset.model._meta.db_table,),
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else 0
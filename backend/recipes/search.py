@@ -0,0 +1,147 @@
+"""
+Полнотекстовый поиск рецептов.
+
+Ищется по названию, описанию и названиям ингредиентов рецепта.
+На PostgreSQL используется столбец search_vector (tsvector с русским
+стеммингом) и GIN-индекс по нему, на SQLite - таблица FTS5
+recipes_recipe_fts. Индекс обновляется явно через
+refresh_search_index() после изменения рецепта или его ингредиентов.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection as default_connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+
+from recipes.constants import SearchConstants
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_REFRESH = """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector(%(config)s, recipe.name), 'A')
+        || setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_recipeingredient AS recipe_ingredient
+            JOIN recipes_ingredient AS ingredient
+                ON ingredient.id = recipe_ingredient.ingredients_id
+            WHERE recipe_ingredient.recipe_id = recipe.id
+        ), '')), 'B')
+        || setweight(to_tsvector(%(config)s, recipe.text), 'C')
+"""
+
+SQLITE_REFRESH = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredients_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), ''), recipe.text
+    FROM recipes_recipe AS recipe
+"""
+
+
+def _chunks(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    for start in range(0, len(recipe_ids), SearchConstants.CHUNK_SIZE):
+        yield recipe_ids[start:start + SearchConstants.CHUNK_SIZE]
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def refresh_search_index(recipe_ids=None, connection=None):
+    """
+    Перестраивает поисковый индекс рецептов recipe_ids.
+
+    Без recipe_ids перестраивается индекс всех рецептов.
+    """
+    connection = connection or default_connection
+    if connection.vendor == 'postgresql':
+        _refresh_postgresql(connection, recipe_ids)
+    elif connection.vendor == 'sqlite':
+        _refresh_sqlite(connection, recipe_ids)
+
+
+def _refresh_postgresql(connection, recipe_ids):
+    params = {'config': SearchConstants.CONFIG}
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(POSTGRESQL_REFRESH, params)
+            return
+        for chunk in _chunks(recipe_ids):
+            cursor.execute(
+                POSTGRESQL_REFRESH + ' WHERE recipe.id = ANY(%(ids)s)',
+                dict(params, ids=chunk),
+            )
+
+
+def _refresh_sqlite(connection, recipe_ids):
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(SQLITE_REFRESH)
+            return
+        for chunk in _chunks(recipe_ids):
+            placeholders = _placeholders(chunk)
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                chunk,
+            )
+            cursor.execute(
+                SQLITE_REFRESH + f' WHERE recipe.id IN ({placeholders})',
+                chunk,
+            )
+
+
+def remove_from_search_index(recipe_ids):
+    """Удаляет рецепты из таблицы FTS5 (на PostgreSQL не требуется)."""
+    if default_connection.vendor != 'sqlite':
+        return
+    with default_connection.cursor() as cursor:
+        for chunk in _chunks(recipe_ids):
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} '
+                f'WHERE rowid IN ({_placeholders(chunk)})',
+                chunk,
+            )
+
+
+def fts_query(text):
+    """Запрос FTS5: все слова текста как префиксы, без операторов."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_recipes(queryset, text):
+    """
+    Фильтрует рецепты по тексту и сортирует их по релевантности.
+
+    Релевантность доступна в аннотации search_rank.
+    """
+    ordering = ('-search_rank', *queryset.model._meta.ordering, '-id')
+    if default_connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SearchConstants.CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by(*ordering)
+    match = fts_query(text)
+    if not match:
+        return queryset.none()
+    weights = ', '.join(map(str, SearchConstants.FTS_WEIGHTS))
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    )).annotate(search_rank=RawSQL(
+        f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s '
+        f'AND {FTS_TABLE}.rowid = recipes_recipe.id',
+        (match,),
+        output_field=FloatField(),
+    )).order_by(*ordering)
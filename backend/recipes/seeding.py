@@ -0,0 +1,382 @@
+"""
+Генерация синтетических данных для нагрузочного тестирования.
+
+Строки генерируются пачками, каждая своим генератором случайных чисел,
+начальное значение которого вычисляется из общего seed и номера пачки:
+при одинаковых параметрах и исходной базе результат не зависит от
+числа процессов. Популярность авторов, рецептов и ингредиентов, а также
+активность пользователей распределены по закону Ципфа.
+
+На PostgreSQL строки загружаются через COPY с заранее выделенными id,
+на остальных базах - через executemany.
+"""
+import csv
+import io
+import multiprocessing
+import random
+from bisect import bisect
+from datetime import timedelta
+from itertools import accumulate
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.constants import SeedConstants
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag, tags_mask)
+from recipes.search import refresh_search_index
+from users.models import Subscription, User
+
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'запеканка', 'блины',
+    'котлеты', 'плов', 'омлет', 'борщ', 'паста', 'соус', 'десерт',
+    'домашний', 'быстрый', 'праздничный', 'острый', 'сладкий', 'летний',
+)
+IMAGE = 'recipes/images/seed.png'
+UNUSABLE_PASSWORD = '!seed'
+
+# Данные, общие для всех пачек. Дочерние процессы получают их при fork,
+# поэтому большие списки id не сериализуются для каждой пачки.
+_shared = {}
+
+
+class ZipfChoice:
+    """Выбор элементов с вероятностью, обратной рангу элемента."""
+
+    def __init__(self, items, exponent=SeedConstants.POPULARITY_EXPONENT):
+        self.items = list(items)
+        self.cumulative = list(accumulate(
+            1 / (rank ** exponent) for rank in range(1, len(self.items) + 1)
+        ))
+
+    def __call__(self, generator):
+        point = generator.random() * self.cumulative[-1]
+        return self.items[bisect(self.cumulative, point)]
+
+    def sample(self, generator, count):
+        """Множество из count разных элементов."""
+        count = min(count, len(self.items))
+        chosen = set()
+        for _ in range(count * 4):
+            if len(chosen) == count:
+                return chosen
+            chosen.add(self(generator))
+        # Хвост распределения почти не выпадает, добираем равномерно.
+        while len(chosen) < count:
+            chosen.add(generator.choice(self.items))
+        return chosen
+
+
+def task_generator(seed, kind, index):
+    return random.Random(f'{seed}:{kind}:{index}')
+
+
+def recipe_rows(task):
+    """
+    Рецепты пачки.
+
+    Каждый рецепт - кортеж (автор, название, описание, время
+    приготовления, дата публикации, маска тегов, id тегов, пары
+    (ингредиент, количество)).
+    """
+    seed, index, count = task
+    generator = task_generator(seed, 'recipes', index)
+    authors, ingredients = _shared['authors'], _shared['ingredients']
+    tags, now = _shared['tags'], _shared['now']
+    rows = []
+    for _ in range(count):
+        recipe_tags = generator.sample(
+            tags, generator.randint(1, min(SeedConstants.TAGS_MAX, len(tags)))
+        )
+        recipe_ingredients = ingredients.sample(generator, generator.randint(
+            SeedConstants.INGREDIENTS_MIN, SeedConstants.INGREDIENTS_MAX
+        ))
+        rows.append((
+            authors(generator),
+            ' '.join(generator.sample(WORDS, 3)).capitalize(),
+            ' '.join(generator.choices(WORDS, k=40)),
+            generator.randint(5, 180),
+            now - timedelta(seconds=generator.randrange(
+                SeedConstants.PUBLISHED_DAYS * 24 * 60 * 60
+            )),
+            tags_mask(bit for _, bit in recipe_tags),
+            [tag_id for tag_id, _ in recipe_tags],
+            [
+                (ingredient_id, generator.randint(1, 500))
+                for ingredient_id in sorted(recipe_ingredients)
+            ],
+        ))
+    return rows
+
+
+def relation_rows(task):
+    """Пары (пользователь, объект) пачки по квотам пользователей."""
+    seed, kind, index, quotas, exclude_self = task
+    generator = task_generator(seed, kind, index)
+    targets = _shared[kind]
+    rows = []
+    for user_id, quota in quotas:
+        chosen = targets.sample(generator, quota + exclude_self)
+        if exclude_self:
+            chosen.discard(user_id)
+        rows.extend(
+            (user_id, target_id) for target_id in sorted(chosen)[:quota]
+        )
+    return rows
+
+
+class Seeder:
+    """Генератор синтетических пользователей, рецептов и связей."""
+
+    def __init__(self, seed=0, batch_size=SeedConstants.BATCH_SIZE,
+                 workers=1, use_copy=True, stdout=None):
+        self.seed = seed
+        self.batch_size = batch_size
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            workers = 1
+        self.workers = workers
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.stdout = stdout
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def ranked(self, items, kind):
+        """Элементы в порядке убывания популярности."""
+        items = sorted(items)
+        task_generator(self.seed, kind, 'rank').shuffle(items)
+        return items
+
+    def generate(self, function, tasks):
+        """Строки пачек по порядку; при workers > 1 - в дочерних процессах."""
+        if self.workers <= 1:
+            for task in tasks:
+                yield function(task)
+            return
+        with multiprocessing.get_context('fork').Pool(self.workers) as pool:
+            yield from pool.imap(function, tasks)
+
+    @staticmethod
+    def max_id(model):
+        return model.objects.aggregate(value=Max('id'))['value'] or 0
+
+    def reserve_ids(self, model, count):
+        """Выделяет id для count новых строк model."""
+        if connection.vendor != 'postgresql':
+            start = self.max_id(model) + 1
+            return list(range(start, start + count))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                'FROM generate_series(1, %s)',
+                [model._meta.db_table, count],
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+    def insert_rows(self, model, fields, rows):
+        """Вставляет строки в таблицу model без создания объектов."""
+        if not rows:
+            return
+        quote_name = connection.ops.quote_name
+        table = quote_name(model._meta.db_table)
+        columns = ', '.join(
+            quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        with connection.cursor() as cursor:
+            if self.use_copy:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                    buffer,
+                )
+                return
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(
+                f'INSERT INTO {table} ({columns}) VALUES ({placeholders})',
+                rows,
+            )
+
+    def create_users(self, count):
+        since = self.max_id(User)
+        generator = task_generator(self.seed, 'users', since)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'load{since + number}',
+                    email=f'load{since + number}@example.com',
+                    first_name=generator.choice(WORDS).title(),
+                    last_name=generator.choice(WORDS).title(),
+                    password=UNUSABLE_PASSWORD,
+                )
+                for number in range(1, count + 1)
+            ),
+            batch_size=self.batch_size,
+        )
+        user_ids = list(User.objects.filter(id__gt=since).order_by(
+            'id'
+        ).values_list('id', flat=True))
+        self.log(f'Пользователей: {len(user_ids)}')
+        return user_ids
+
+    def create_recipes(self, count, author_ids):
+        tags = list(Tag.objects.values_list('id', 'bit'))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tags or not ingredient_ids:
+            raise ValueError(
+                'Нужны теги и ингредиенты: выполните create_tags и '
+                'import_ingredients.'
+            )
+        if not author_ids:
+            raise ValueError('Нужны авторы рецептов.')
+        _shared.update(
+            authors=ZipfChoice(self.ranked(author_ids, 'authors')),
+            ingredients=ZipfChoice(self.ranked(ingredient_ids, 'ingredients')),
+            tags=sorted(tags),
+            now=timezone.now(),
+        )
+        tasks = (
+            (self.seed, index, min(self.batch_size, count - start))
+            for index, start in enumerate(range(0, count, self.batch_size))
+        )
+        recipe_ids = []
+        for rows in self.generate(recipe_rows, tasks):
+            recipe_ids.extend(self.save_recipes(rows))
+            self.log(f'Рецептов: {len(recipe_ids)}')
+        return recipe_ids
+
+    def save_recipes(self, rows):
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        with transaction.atomic():
+            recipe_ids = self.reserve_ids(Recipe, len(rows))
+            self.insert_rows(
+                Recipe,
+                ('id', 'author', 'name', 'text', 'cooking_time', 'image',
+                 'pub_date', 'tags_mask', 'favorites_count'),
+                [
+                    (recipe_id, author_id, name, text, cooking_time, IMAGE,
+                     adapt_datetime(pub_date), mask, 0)
+                    for recipe_id, (
+                        author_id, name, text, cooking_time, pub_date, mask,
+                        _, _,
+                    ) in zip(recipe_ids, rows)
+                ],
+            )
+            self.insert_rows(
+                RecipeIngredient,
+                ('recipe', 'ingredients', 'amount'),
+                [
+                    (recipe_id, ingredient_id, amount)
+                    for recipe_id, row in zip(recipe_ids, rows)
+                    for ingredient_id, amount in row[7]
+                ],
+            )
+            self.insert_rows(
+                Recipe.tags.through,
+                ('recipe', 'tag'),
+                [
+                    (recipe_id, tag_id)
+                    for recipe_id, row in zip(recipe_ids, rows)
+                    for tag_id in row[6]
+                ],
+            )
+        return recipe_ids
+
+    def quotas(self, total, user_ids, cap):
+        """Распределяет total связей между пользователями по активности."""
+        ranked = self.ranked(user_ids, 'activity')
+        weights = [
+            1 / (rank ** SeedConstants.ACTIVITY_EXPONENT)
+            for rank in range(1, len(ranked) + 1)
+        ]
+        scale = total / sum(weights) if weights else 0
+        generator = task_generator(self.seed, 'quotas', total)
+        return sorted(
+            (user_id, min(cap, int(weight * scale + generator.random())))
+            for user_id, weight in zip(ranked, weights)
+        )
+
+    def relation_tasks(self, kind, quotas, exclude_self):
+        task, size, index = [], 0, 0
+        for user_id, quota in quotas:
+            if not quota:
+                continue
+            task.append((user_id, quota))
+            size += quota
+            if size >= self.batch_size:
+                yield self.seed, kind, index, task, exclude_self
+                task, size, index = [], 0, index + 1
+        if task:
+            yield self.seed, kind, index, task, exclude_self
+
+    def create_relations(self, model, target_field, count, user_ids,
+                         targets, exclude_self=False):
+        """
+        Создает связи пользователей user_ids с популярными объектами.
+
+        Связи создаются только для новых пользователей, поэтому
+        уникальность пар обеспечивается при генерации.
+        """
+        kind = model._meta.model_name
+        _shared[kind] = ZipfChoice(targets)
+        cap = max((len(targets) - exclude_self) // 2, 1)
+        created = 0
+        tasks = self.relation_tasks(
+            kind, self.quotas(count, user_ids, cap), exclude_self
+        )
+        for rows in self.generate(relation_rows, tasks):
+            self.insert_rows(model, ('user', target_field), rows)
+            created += len(rows)
+        self.log(
+            f'{model._meta.verbose_name_plural.capitalize()}: {created}'
+        )
+        return created
+
+    def create_favorites(self, count, user_ids, recipe_ids):
+        return self.create_relations(
+            Favorite, 'recipe', count, user_ids,
+            self.ranked(recipe_ids, 'recipes'),
+        )
+
+    def create_carts(self, count, user_ids, recipe_ids):
+        return self.create_relations(
+            ShoppingCart, 'recipe', count, user_ids,
+            self.ranked(recipe_ids, 'recipes'),
+        )
+
+    def create_subscriptions(self, count, user_ids, author_ids):
+        return self.create_relations(
+            Subscription, 'following', count, user_ids,
+            self.ranked(author_ids, 'authors'), exclude_self=True,
+        )
+
+    def refresh_denormalized(self, recipe_ids, feed_user_ids=()):
+        """Пересчитывает счетчики, поисковый индекс, списки и ленты."""
+        if recipe_ids:
+            Recipe.objects.filter(
+                id__gte=min(recipe_ids)
+            ).refresh_favorites_count()
+            refresh_search_index(recipe_ids)
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        for user in User.objects.filter(id__in=feed_user_ids):
+            for author in User.objects.filter(following__user=user):
+                FeedEntry.objects.backfill(user, author)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.log('Денормализованные данные пересчитаны')
+
+    def run(self, users, recipes, favorites, carts, subscriptions,
+            feed_users=0):
+        """Создает полный набор данных и возвращает id пользователей."""
+        user_ids = self.create_users(users)
+        recipe_ids = self.create_recipes(recipes, user_ids)
+        self.create_subscriptions(subscriptions, user_ids, user_ids)
+        self.create_favorites(favorites, user_ids, recipe_ids)
+        self.create_carts(carts, user_ids, recipe_ids)
+        self.refresh_denormalized(recipe_ids, user_ids[:feed_users])
+        return user_ids
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from recipes.cache import (bump_version_on_commit, recipe_scope,
+                           user_scope)
+from recipes.images import schedule_variants
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from recipes.search import refresh_search_index, remove_from_search_index
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    bump_version_on_commit('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created, **kwargs):
+    if not created:
+        refresh_search_index(
+            instance.recipe_ingredients.values_list('recipe_id', flat=True)
+        )
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    bump_version_on_commit('tags')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    bump_version_on_commit(recipe_scope(instance.pk))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    schedule_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    remove_from_search_index([instance.pk])
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    bump_version_on_commit(recipe_scope(instance.recipe_id))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list('id', flat=True)
+        )
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = getattr(instance, '_cleared_recipe_ids', ())
+    else:
+        recipe_ids = pk_set or ()
+    Recipe.objects.filter(id__in=recipe_ids).refresh_tags_mask()
+    if not reverse:
+        bump_version_on_commit(recipe_scope(instance.pk))
+    elif pk_set:
+        for recipe_id in pk_set:
+            bump_version_on_commit(recipe_scope(recipe_id))
+    else:
+        bump_version_on_commit('tags')
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(instance, **kwargs):
+    instance._recipe_ids = list(instance.recipes.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    Recipe.objects.filter(
+        id__in=getattr(instance, '_recipe_ids', ())
+    ).refresh_tags_mask()
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version_on_commit(user_scope(instance.pk))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from recipes.paginator import EstimatedCountPaginator
+
 from .models import Subscription, User
 
 
@@ -14,9 +16,10 @@ class UserAdmin(UserAdmin):
         'first_name',
         'last_name',
     )
-    list_filter = ('email', 'username')
     search_fields = ('username', 'email', 'first_name', 'last_name',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
@@ -24,6 +27,9 @@ class SubscriptionAdmin(admin.ModelAdmin):
     """Административный класс для управления подписками."""
 
     list_display = ('user', 'following',)
-    list_filter = ('user', 'following',)
+    list_select_related = ('user', 'following')
     search_fields = ('user__username', 'following__username',)
+    autocomplete_fields = ('user', 'following')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -1,3 +1,8 @@
 class UsersConstants:
     EMAIL_LENGTH_MAX = 254
     NAME_LENGTH_MAX = 150
+
+
+class TokenCacheConstants:
+    SIZE = 10000
+    TTL = 300
@@ -1,10 +1,31 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import UserManager as BaseUserManager
 from django.db import models
 from django.core.validators import RegexValidator
 
 from .constants import UsersConstants
 
 
+class UserQuerySet(models.QuerySet):
+    """Набор запросов пользователей."""
+
+    def with_is_subscribed(self, user):
+        """Аннотирует подписку пользователя user на каждого из выбранных."""
+        if not user.is_authenticated:
+            return self.annotate(is_subscribed=models.Value(
+                False, output_field=models.BooleanField()
+            ))
+        return self.annotate(is_subscribed=models.Exists(
+            Subscription.objects.filter(
+                user=user, following=models.OuterRef('pk')
+            )
+        ))
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    """Менеджер пользователей."""
+
+
 class User(AbstractUser):
     """Модель пользователя."""
 
@@ -35,6 +56,8 @@ class User(AbstractUser):
         max_length=UsersConstants.NAME_LENGTH_MAX,
     )
 
+    objects = UserManager()
+
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'пользователи'